@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""script bench_highrate.py
+
+Benchmark for the HighRate read-out mode of PhyPiDAQ:
+ToyDataConfig is read in a background thread (HighRateReadout) into
+a DataRing at increasing rates, while a consumer reads the ring every
+50 ms, as done by the output stage of run_phypi.py.
+
+For each rate, the achieved read-out rate, the fraction of late
+read-out cycles and the number of lost samples are shown; the
+sustainable rate is the highest rate reached within 2% without
+losing samples.
+
+usage: bench_highrate.py [-c <number of channels>] [-t <seconds per rate>]
+"""
+
+import argparse
+import time
+
+from phypidaq.ToyDataConfig import ToyDataConfig
+from phypidaq.DataRing import DataRing
+from phypidaq.HighRateReadout import HighRateReadout
+import numpy as np
+
+
+def run_rate(device, rate, NChannels, duration, NBlock=1):
+    """read device at given rate for duration seconds
+
+    Returns: achieved rate, fraction of late cycles, lost samples
+    """
+    dt = NBlock / rate
+    buf = np.zeros((NBlock, NChannels))
+    tstamps = np.zeros(NBlock)
+
+    def acquire():
+        if NBlock > 1:
+            tstamps[:] = device.acquireBlock(buf, NBlock)
+        else:
+            device.acquireData(buf[0])
+            tstamps[0] = time.time()
+        return buf, tstamps
+
+    ring = DataRing(max(int(10 * rate), 10 * NBlock), NChannels)
+    readout = HighRateReadout(acquire, ring, dt)
+    readout.start()
+    readout.resume()
+    seq = 0
+    Nlost = 0
+    t0 = time.time()
+    while time.time() - t0 < duration:
+        time.sleep(0.05)  # consumer reads ring at its own pace
+        seq, data, ts, lost = ring.read(seq)
+        Nlost += lost
+    readout.stop()
+    seq, data, ts, lost = ring.read(seq)
+    Nlost += lost
+    T = time.time() - t0
+    return ring.seq / T, readout.Nlag / max(readout.Ncycles, 1), Nlost
+
+
+if __name__ == "__main__":  # - - - - - - - - - - - - - - - - - - - - - -
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--channels", type=int, default=2, help="number of channels")
+    parser.add_argument("-t", "--time", type=float, default=3.0, help="run time per rate in seconds")
+    parser.add_argument("-b", "--blocksize", type=int, default=1, help="samples per read-out (block mode)")
+    parser.add_argument(
+        "-r", "--rates", type=float, nargs="+", default=[100, 500, 1000, 2000, 5000, 10000], help="rates in Hz"
+    )
+    args = parser.parse_args()
+
+    device = ToyDataConfig({"NChannels": args.channels})
+    device.init()
+
+    print(
+        "*==* HighRate benchmark with ToyDataConfig, {0} channel(s), block size {1}".format(
+            args.channels, args.blocksize
+        )
+    )
+    print("{0:>10} {1:>12} {2:>8} {3:>8}".format("rate (Hz)", "achieved", "late", "lost"))
+    sustainable = 0.0
+    for rate in args.rates:
+        achieved, late, lost = run_rate(device, rate, args.channels, args.time, args.blocksize)
+        print("{0:>10.0f} {1:>12.1f} {2:>7.1f}% {3:>8d}".format(rate, achieved, 100.0 * late, lost))
+        if achieved > 0.98 * rate and lost == 0:
+            sustainable = rate
+    print("sustainable rate: {0:.0f} Hz".format(sustainable))
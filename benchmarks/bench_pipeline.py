@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""script bench_pipeline.py
+
+Benchmark of the data processing pipeline of PhyPiDAQ, run headless:
+the read-out cycle of runPhyPiDAQ (acquire() and outputData()) is
+executed without waits and without display, for
+
+  devices:  toy       - ToyDataConfig
+            replay    - ReplayConfig, replaying a generated file
+            synthetic - wide-channel device returning stored data,
+                        i.e. without cost of data generation
+  channels: 1, 8, 64, 1024
+  stages:   plain     - read-out and history buffer only
+            calib     - with calibration (ChanCalib)
+            formula   - with formulae (ChanFormula)
+            recorder  - with DataRecorder
+            fifo      - with output to fifo
+            websocket - with output to websocket (needs package websockets)
+            all       - all of the above
+
+Reported per case:
+  rate:    maximum sustainable sample rate (samples processed per second)
+  latency: duration of a read-out cycle, from read-out of a (block of)
+           sample(s) to the end of output (median and 99% quantile)
+  memory:  peak of memory allocated during read-out cycles (tracemalloc)
+
+Results are saved in json format and can be compared with those of
+an earlier run (e.g. of a previous version) with option --compare.
+
+usage: bench_pipeline.py [-t <seconds per case>] [-b <block size>]
+                         [-d <devices>] [-c <channels>] [-s <stages>]
+                         [-o <results file>] [--compare <old results file>]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import yaml
+
+import phypidaq
+from phypidaq.runPhyPiDAQ import runPhyPiDAQ
+from phypidaq.DataRecorder import DataRecorder
+from phypidaq.ToyDataConfig import ToyDataConfig
+from phypidaq.LatencyStats import LatencyStats
+
+DEVICES = ["toy", "replay", "synthetic"]
+CHANNELS = [1, 8, 64, 1024]
+STAGES = ["plain", "calib", "formula", "recorder", "fifo", "websocket", "all"]
+
+try:
+    import websockets  # noqa: F401
+
+    haveWebsockets = True
+except ImportError:
+    haveWebsockets = False
+
+
+class SyntheticDevice(object):
+    """wide-channel device returning stored random data"""
+
+    def __init__(self, confdict=None):
+        if confdict is None:
+            confdict = {}
+        self.NChannels = confdict.get("NChannels", 1)
+        self.ChanLims = [[0.0, 1.0]] * self.NChannels
+        self.ChanNams = ["c" + str(i) for i in range(self.NChannels)]
+        self.ChanUnits = [""] * self.NChannels
+        self.pattern = np.random.rand(64, self.NChannels)
+        self.k = 0
+
+    def init(self):
+        pass
+
+    def acquireData(self, buf):
+        buf[: self.NChannels] = self.pattern[self.k % len(self.pattern)]
+        self.k += 1
+
+    def acquireBlock(self, buf, n):
+        idx = (self.k + np.arange(n)) % len(self.pattern)
+        buf[:n, : self.NChannels] = self.pattern[idx]
+        self.k += n
+        return np.full(n, time.time())
+
+    def closeDevice(self):
+        pass
+
+
+def make_replay_file(tmpdir, NChannels, NSamples=1000):
+    """write file with toy data in PhyPiDAQ format, return file name"""
+    toy = ToyDataConfig({"NChannels": NChannels})
+    toy.init()
+    buf = np.zeros((NSamples, NChannels))
+    toy.acquireBlock(buf, NSamples)
+    conf = {
+        "Interval": 0.001,
+        "NChannels": NChannels,
+        "ChanLimits": toy.ChanLims,
+        "ChanNams": toy.ChanNams,
+    }
+    rec = DataRecorder(os.path.join(tmpdir, "replay{0}.csv".format(NChannels)), conf)
+    rec(buf)
+    rec.close()
+    return rec.f.name
+
+
+def drain_fifo(fname):
+    """read fifo until writer closes it"""
+    with open(fname, "r") as f:
+        while f.read(65536):
+            pass
+
+
+def read_websocket(uri="ws://localhost:8314"):
+    """read from websocket until empty record is received"""
+    import asyncio
+
+    async def read_ws():
+        for _ in range(50):  # wait for server to start
+            try:
+                websocket = await websockets.connect(uri, ping_interval=None)
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        else:
+            return
+        async with websocket:
+            await websocket.send("req_connect")
+            await websocket.recv()
+            await websocket.send("getData")
+            try:
+                while await websocket.recv() != "\n":
+                    pass
+            except websockets.ConnectionClosed:  # server shut down before all data were sent
+                pass
+
+    asyncio.new_event_loop().run_until_complete(read_ws())
+
+
+def make_config(tmpdir, device, NChannels, stage, BlockSize):
+    """write device and DAQ configuration files, return name of DAQ configuration"""
+    if device == "replay":
+        devConf = {"DAQModule": "ReplayConfig", "csvFile": make_replay_file(tmpdir, NChannels)}
+    else:  # synthetic device replaces ToyDataConfig after set-up
+        devConf = {"DAQModule": "ToyDataConfig", "NChannels": NChannels}
+    devFile = os.path.join(tmpdir, "device.yaml")
+    with open(devFile, "w") as f:
+        yaml.dump(devConf, f)
+
+    conf = {
+        "DeviceFile": devFile,
+        "Interval": 0.05,
+        "BlockSize": BlockSize,
+        "DisplayModule": None,
+        "startActive": True,
+    }
+    if stage in ("calib", "all"):
+        conf["ChanCalib"] = [[[0.0, 0.5, 1.0], [0.0, 1.0, 4.0]]] * NChannels
+    if stage in ("formula", "all"):
+        conf["ChanFormula"] = ["2*c{0} + sqrt(abs(c{1}))".format(i, (i + 1) % NChannels) for i in range(NChannels)]
+        conf["ChanLimits"] = [[-10.0, 10.0]] * NChannels
+    if stage in ("recorder", "all"):
+        conf["DataFile"] = os.path.join(tmpdir, "recorded.csv")
+    if stage in ("fifo", "all"):
+        conf["DAQfifo"] = os.path.join(tmpdir, "DAQfifo")
+        conf["FifoOverflow"] = "block"  # no samples dropped and ...
+        conf["FifoQueueSize"] = 4  # ... little buffering: sustainable rate
+    if stage == "websocket" or (stage == "all" and haveWebsockets):
+        conf["DAQwebsocket"] = True
+    confFile = os.path.join(tmpdir, "bench.daq")
+    with open(confFile, "w") as f:
+        yaml.dump(conf, f)
+    return confFile, conf
+
+
+def run_case(device, NChannels, stage, duration, BlockSize):
+    """set up pipeline, run read-out cycles for duration seconds
+
+    Returns: dictionary with results
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        confFile, conf = make_config(tmpdir, device, NChannels, stage, BlockSize)
+        readers = []
+        if "DAQfifo" in conf:
+            os.mkfifo(conf["DAQfifo"])
+            readers.append(threading.Thread(target=drain_fifo, args=(conf["DAQfifo"],)))
+        if "DAQwebsocket" in conf:
+            readers.append(threading.Thread(target=read_websocket))
+        for t in readers:
+            t.daemon = True
+            t.start()
+
+        daq = runPhyPiDAQ(verbose=0)
+        argv = sys.argv
+        sys.argv = [argv[0], confFile]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                daq.setup()
+        finally:
+            sys.argv = argv
+        if device == "synthetic":
+            daq.DEVs = [SyntheticDevice({"NChannels": NChannels})]
+        daq.display_manager = None
+        daq.initBuffers()
+        daq.initOutput()
+
+        # timing of read-out cycles
+        NBlock = daq.BlockSize
+        cycles = LatencyStats()
+        cnt = 0
+        t0 = time.perf_counter()
+        tend = t0 + duration
+        t = t0
+        while t < tend:
+            block, ts = daq.acquire()
+            daq.outputData(block, cnt * NBlock + 1)
+            cnt += 1
+            t = cycles.mark("cycle", t)
+        daq.bus.drain()  # outputs run in threads, include time until all data are delivered
+        rate = cnt * NBlock / (time.perf_counter() - t0)
+
+        # peak memory allocated in (at most 200) read-out cycles
+        tracemalloc.start()
+        for k in range(min(cnt, 200)):
+            block, ts = daq.acquire()
+            daq.outputData(block, (cnt + k) * NBlock + 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # close down
+        with contextlib.redirect_stdout(io.StringIO()):
+            daq.bus.close()
+            if daq.DatRec:
+                daq.DatRec.close()
+            if daq.DAQfifo:
+                daq.send_to_fifo.close()
+            if daq.DAQwebsocket:
+                daq.send_to_websocket.close()
+            if daq.Readout is not None:
+                daq.Readout.close()
+            for DEV in daq.DEVs:
+                DEV.closeDevice()
+        for t in readers:
+            t.join(timeout=2.0)
+
+    return {
+        "device": device,
+        "channels": NChannels,
+        "stage": stage,
+        "BlockSize": NBlock,
+        "rate": rate,
+        "latency_ms_50": 1000.0 * cycles.percentile("cycle", 0.5),
+        "latency_ms_99": 1000.0 * cycles.percentile("cycle", 0.99),
+        "peak_kB": peak / 1024.0,
+        "stages_ms": {s: 1000.0 * daq.stats.sum[s] / daq.stats.n[s] for s in daq.stats.stages},
+    }
+
+
+def compare(results, fname):
+    """print ratio of rates with respect to results in file fname"""
+    with open(fname) as f:
+        old = json.load(f)
+    print("\n*==* comparison with {0} (version {1})".format(fname, old["version"]))
+    print(
+        "{0:>10} {1:>8} {2:>10} {3:>12} {4:>12} {5:>8}".format(
+            "device", "channels", "stage", "rate", "old rate", "ratio"
+        )
+    )
+    ref = {(r["device"], r["channels"], r["stage"], r["BlockSize"]): r for r in old["results"]}
+    for r in results:
+        o = ref.get((r["device"], r["channels"], r["stage"], r["BlockSize"]))
+        if o is None:
+            continue
+        print(
+            "{0:>10} {1:>8d} {2:>10} {3:>12.0f} {4:>12.0f} {5:>8.2f}".format(
+                r["device"], r["channels"], r["stage"], r["rate"], o["rate"], r["rate"] / o["rate"]
+            )
+        )
+
+
+if __name__ == "__main__":  # - - - - - - - - - - - - - - - - - - - - - -
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-t", "--time", type=float, default=1.0, help="run time per case in seconds")
+    parser.add_argument("-b", "--blocksize", type=int, default=1, help="samples per read-out (block mode)")
+    parser.add_argument("-d", "--devices", nargs="+", default=DEVICES, choices=DEVICES, help="devices")
+    parser.add_argument("-c", "--channels", type=int, nargs="+", default=CHANNELS, help="numbers of channels")
+    parser.add_argument("-s", "--stages", nargs="+", default=STAGES, choices=STAGES, help="processing stages")
+    parser.add_argument("-o", "--output", default=None, help="file for results (json)")
+    parser.add_argument("--compare", default=None, help="results of earlier run to compare with")
+    args = parser.parse_args()
+
+    stages = args.stages
+    if not haveWebsockets and "websocket" in stages:
+        print("!!! package websockets not installed - skipping websocket output")
+        stages = [s for s in stages if s != "websocket"]
+
+    print("*==* PhyPiDAQ pipeline benchmark, version {0}, block size {1}".format(phypidaq.__version__, args.blocksize))
+    print(
+        "{0:>10} {1:>8} {2:>10} {3:>12} {4:>12} {5:>12} {6:>10}".format(
+            "device", "channels", "stage", "rate (Hz)", "lat50 (ms)", "lat99 (ms)", "peak (kB)"
+        )
+    )
+    results = []
+    for device in args.devices:
+        for NChannels in args.channels:
+            for stage in stages:
+                r = run_case(device, NChannels, stage, args.time, args.blocksize)
+                results.append(r)
+                print(
+                    "{0:>10} {1:>8d} {2:>10} {3:>12.0f} {4:>12.3g} {5:>12.3g} {6:>10.1f}".format(
+                        device, NChannels, stage, r["rate"], r["latency_ms_50"], r["latency_ms_99"], r["peak_kB"]
+                    ),
+                    flush=True,
+                )
+
+    fname = args.output if args.output else "bench_pipeline_{0}.json".format(phypidaq.__version__)
+    with open(fname, "w") as f:
+        json.dump(
+            {
+                "version": phypidaq.__version__,
+                "date": time.strftime("%Y-%m-%d %H:%M"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            },
+            f,
+            indent=1,
+        )
+    print("results saved to " + fname)
+
+    if args.compare:
+        compare(results, args.compare)
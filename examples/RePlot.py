@@ -3,7 +3,7 @@
 """script RePlot.py
 usage: RePlot.py [filename] [[channel numbers]]
 
-Read data exported by run_phypi.py and show plot
+Read data exported by run_phypi.py (csv or binary format, .pdaq) and show plot
 """
 
 from __future__ import print_function, division, unicode_literals
@@ -11,7 +11,9 @@ from __future__ import absolute_import
 
 import numpy as np
 import sys
+import time
 import matplotlib.pyplot as plt
+from phypidaq.BinaryData import BinaryReader
 
 if len(sys.argv) >= 2:
     fnam = sys.argv[1]
@@ -25,18 +27,27 @@ if len(sys.argv) >= 3:
         Channels.append(int(sys.argv[i + 2]))
 
 # read data from file
-f = open(fnam)
-txtdata = f.read().splitlines()
-f.close()
-
-# read and analyze header
-h0 = txtdata[0][2:]  # remove leading '#'
-h1 = txtdata[1][2:]
-h2 = txtdata[2][2:]
-dT = float(h1.split(" ")[-1])
-tags = h2.split(",")
-# read data part
-data = np.loadtxt(txtdata, dtype=np.float32, delimiter=",", unpack=True)
+if fnam.endswith(".pdaq"):  # binary format
+    r = BinaryReader(fnam)
+    h0 = "PhyPiDAQ Data recorder " + time.strftime("%y%m%d-%H%M", time.localtime(r.StartTime))
+    h1 = "  logging interval {0:.3g}".format(r.Interval)
+    h2 = ",".join(r.ChanTags)
+    dT = r.Interval
+    tags = r.ChanTags
+    data = r.data.T  # mapped to memory, no copy
+else:
+    f = open(fnam)
+    txtdata = f.read().splitlines()
+    f.close()
+
+    # read and analyze header
+    h0 = txtdata[0][2:]  # remove leading '#'
+    h1 = txtdata[1][2:]
+    h2 = txtdata[2][2:]
+    dT = float(h1.split(" ")[-1])
+    tags = h2.split(",")
+    # read data part
+    data = np.loadtxt(txtdata, dtype=np.float32, delimiter=",", unpack=True)
 Ndat = len(data[0])  # number of data points in file
 
 print("Data set header:")
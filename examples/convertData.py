@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""script convertData.py
+usage: convertData.py [-s <separator>] [-p float32|float64] [-o <output file>] <file>
+
+Convert data files written by run_phypi.py from csv to binary format
+(extension .pdaq) and vice versa
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import argparse
+from phypidaq.BinaryData import csv2bin, bin2csv
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("file", help="input file, .pdaq for binary format")
+parser.add_argument("-s", "--separator", default=",", help="field separator of csv file")
+parser.add_argument("-p", "--precision", default="float32", choices=["float32", "float64"], help="binary data type")
+parser.add_argument("-o", "--output", default=None, help="output file")
+args = parser.parse_args()
+
+if args.file.endswith(".pdaq"):
+    fnam = bin2csv(args.file, args.output, sep=args.separator)
+else:
+    fnam = csv2bin(args.file, args.output, sep=args.separator, dtype=args.precision)
+print("*==* ", args.file, " converted to ", fnam)
@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """script read_Pipe.py
-usage: read_Pipe [name of pipe]
+usage: read_Pipe [-b] [-s <n>] [name of pipe]
 
 Read data from a named linux pipe
 filled by run_phypi.py with option
 DAQfifo: <name of pipe>
+option -b: binary frames (FifoFormat: binary)
+option -s: resume, start with sample number n if still kept
+           by the writer (FifoRetention), e.g. after a disconnect;
+           needs FifoFormat csv_seq or binary
 """
 
 import sys
 import os
 import errno
 
-if len(sys.argv) >= 2:
-    FiFo = sys.argv[1]
+binary = "-b" in sys.argv[1:]
+args = [a for a in sys.argv[1:] if a != "-b"]
+since = None
+if "-s" in args:
+    k = args.index("-s")
+    since = int(args[k + 1])
+    del args[k : k + 2]
+if len(args) >= 1:
+    FiFo = args[0]
 else:
     FiFo = "PhyPiDAQ.fifo"
 print("*==* ", sys.argv[0], " Lese Daten aus Pipe", FiFo)
@@ -25,11 +36,37 @@ except OSError as e:
     if e.errno != errno.EEXIST:
         raise
 
-# with os.open(FiFo, os.O_RDONLY | os.O_NONBLOCK) as f:
-with open(FiFo) as f:
-    # inp = f.read()  f.readline()
-    for inp in f:
-        if inp == "\n":
-            break
-        print("Read: %s " % inp, end="")
-print("        empty line received, ending")
+# request samples from number since on, read by writer when fifo is opened
+if since is not None:
+    with open(FiFo + ".since", "w") as f:
+        f.write(str(since))
+
+if binary:
+    from phypidaq.BinaryData import unpackFrame
+
+    with open(FiFo, "rb") as f:
+        buf = b""
+        while True:
+            inp = f.read1(65536)
+            if not inp:
+                break
+            buf += inp
+            offset = 0
+            while True:
+                frame = unpackFrame(buf, offset)
+                if frame is None:
+                    break
+                seq, tstamps, data, offset = frame
+                for k in range(len(data)):
+                    print("Read: %d %.3f %s" % (seq + k, tstamps[k], data[k]))
+            buf = buf[offset:]
+    print("        end of file, ending")
+else:
+    # with os.open(FiFo, os.O_RDONLY | os.O_NONBLOCK) as f:
+    with open(FiFo) as f:
+        # inp = f.read()  f.readline()
+        for inp in f:
+            if inp == "\n":
+                break
+            print("Read: %s " % inp, end="")
+    print("        end of data, ending")
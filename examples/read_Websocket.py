@@ -1,21 +1,34 @@
 #!/usr/bin/env python3
-"""Read data in CSV format from websocket"""
+"""Read data in CSV format or as binary frames from websocket
+usage: read_Websocket.py [-b] [-r] [url]
+
+option -b: binary frames instead of CSV
+option -r: reconnect after loss of connection and resume with
+           the next sample (kept by server for WebsocketRetention s)
+"""
 
 import sys
 import asyncio
+import json
 import websockets
 
+binary = "-b" in sys.argv[1:]
+resume = "-r" in sys.argv[1:]
+args = [a for a in sys.argv[1:] if a not in ("-b", "-r")]
 # read url from command line
-if len(sys.argv) >= 2:
-    uri = sys.argv[1]
+if len(args) >= 1:
+    uri = args[0]
 else:
     # host url and port
     uri = "ws://localhost:8314"
 print("*==* ", sys.argv[0], " Lese Daten von url ", uri)
 
+last = None  # number of last sample received
+
 
 async def read_ws():
     """asynchronous read from websocket"""
+    global last
     async with websockets.connect(uri, ping_interval=None) as websocket:
         # test connection
         await websocket.send("req_connect")
@@ -24,15 +37,46 @@ async def read_ws():
             print("** connected to websocket ", uri)
 
         # get data
-        await websocket.send("getData")
+        request = "getData"
+        if binary:
+            from phypidaq.BinaryData import unpackFrame
+
+            request += " binary"
+        elif resume:
+            request += " csv"  # with sample number
+        if last is not None:
+            request += " since %d" % (last + 1)
+        await websocket.send(request)
+        if request != "getData":
+            print("** ", json.loads(await websocket.recv()))
         while True:
             inp = await websocket.recv()
             if inp == "\n":  # empty record, end
                 print("empty input - closing")
                 sys.exit(0)
+            elif binary:  # one or more frames per message
+                offset = 0
+                while offset < len(inp):
+                    seq, tstamps, data, offset = unpackFrame(inp, offset)
+                    for k in range(len(data)):
+                        print("read: %d %.3f %s" % (seq + k, tstamps[k], data[k]))
+                    last = seq + len(data) - 1
             else:
                 print("read: %s " % inp, end="")
+                if resume:
+                    last = int(inp.splitlines()[-1].split(",")[0])
+
+
+async def run():
+    while True:
+        try:
+            await read_ws()
+        except (OSError, websockets.ConnectionClosedError) as e:
+            if not resume:
+                raise
+            print("** connection lost (%s) - reconnecting" % e)
+            await asyncio.sleep(1.0)
 
 
 # run web client
-asyncio.get_event_loop().run_until_complete(read_ws())
+asyncio.get_event_loop().run_until_complete(run())
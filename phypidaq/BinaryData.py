@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""binary data files and data frames of PhyPiDAQ
+
+Files (extension .pdaq) consist of
+
+  - 8 bytes "PHYPIDAQ", format version and length of header (uint32 each),
+  - header in json format: channel names, tags and units, logging interval,
+    start time and data type (float32 or float64), padded with blanks to
+    a multiple of 8 bytes,
+  - records of fixed width, one per sample: time stamp (float64) followed
+    by the values of all channels; records are appended in chunks, i.e. as
+    blocks of samples, in little-endian byte order.
+
+As all records have the same width, a reader maps the file into memory
+and gets instant access to any sample; a record left incomplete by an
+interrupted write is ignored.
+
+Converters from and to the csv format of DataRecorder are provided by
+csv2bin() and bin2csv().
+
+For transfer to other processes (fifo, websocket), blocks of samples are
+packed into frames by packFrame() and unpacked by unpackFrame():
+
+  - header of 24 bytes: "PDQF", number of samples n, number of channels,
+    bytes per value (4 or 8, all uint32) and sequence number of the first
+    sample (uint64),
+  - n time stamps (float64),
+  - n x NChannels values (float32 or float64), one sample after the other.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import json
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b"PHYPIDAQ"
+VERSION = 1
+FRAME_MAGIC = b"PDQF"
+FRAME_HEADER = struct.Struct("<4sIIIQ")
+
+
+def splitTag(tag):
+    """split channel tag "name:label(unit)" into name, label and unit"""
+    name, _, rest = tag.partition(":")
+    unit = ""
+    if rest.endswith(")") and "(" in rest:
+        rest, unit = rest[:-1].rsplit("(", 1)
+    return name, rest, unit
+
+
+class BinaryWriter(object):
+    """write samples with time stamps to binary file"""
+
+    def __init__(self, fname, ChanTags, dT, dtype="float32", T0=None):
+        """Args:
+        fname:    file name
+        ChanTags: channel tags "name:label(unit)"
+        dT:       logging interval
+        dtype:    data type of values, "float32" or "float64"
+        T0:       start time, current time if None
+        """
+        self.NChannels = len(ChanTags)
+        self.record = np.dtype([("t", "<f8"), ("data", np.dtype(dtype).newbyteorder("<"), (self.NChannels,))])
+        self.T0 = time.time() if T0 is None else T0
+        header = {
+            "NChannels": self.NChannels,
+            "ChanTags": list(ChanTags),
+            "ChanNams": [splitTag(t)[0] for t in ChanTags],
+            "ChanUnits": [splitTag(t)[2] for t in ChanTags],
+            "Interval": dT,
+            "StartTime": self.T0,
+            "dtype": np.dtype(dtype).name,
+        }
+        h = json.dumps(header).encode("utf-8")
+        h += b" " * (-(len(MAGIC) + 8 + len(h)) % 8)  # records start at multiple of 8 bytes
+        self.f = open(fname, "wb")
+        self.f.write(MAGIC + struct.pack("<II", VERSION, len(h)) + h)
+        self.f.flush()
+
+    def write(self, data, tstamps):
+        """append chunk of samples
+
+        Args:
+          data:    array of shape (n, NChannels)
+          tstamps: array of n time stamps
+        """
+        data = np.atleast_2d(data)
+        rec = np.empty(len(data), dtype=self.record)
+        rec["t"] = tstamps
+        rec["data"] = data[:, : self.NChannels]
+        self.f.write(rec.tobytes())
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+
+class BinaryReader(object):
+    """read binary file of PhyPiDAQ, mapped into memory
+
+    Attributes:
+      NChannels, ChanTags, ChanNams, ChanUnits, Interval, StartTime, dtype: from header
+      data:    array of shape (Nsamples, NChannels), mapped to file (read-only)
+      tstamps: array of Nsamples time stamps, mapped to file (read-only)
+    """
+
+    def __init__(self, fname):
+        with open(fname, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a PhyPiDAQ binary file: " + fname)
+            version, hlen = struct.unpack("<II", f.read(8))
+            if version > VERSION:
+                raise ValueError("unsupported format version {0} of file {1}".format(version, fname))
+            self.header = json.loads(f.read(hlen).decode("utf-8"))
+        for key in ("NChannels", "ChanTags", "ChanNams", "ChanUnits", "Interval", "StartTime", "dtype"):
+            setattr(self, key, self.header[key])
+
+        record = np.dtype([("t", "<f8"), ("data", np.dtype(self.dtype).newbyteorder("<"), (self.NChannels,))])
+        offset = len(MAGIC) + 8 + hlen
+        Nsamples = (os.path.getsize(fname) - offset) // record.itemsize  # complete records only
+        if Nsamples > 0:
+            self.records = np.memmap(fname, dtype=record, mode="r", offset=offset, shape=(Nsamples,))
+        else:
+            self.records = np.zeros(0, dtype=record)
+        self.tstamps = self.records["t"]
+        self.data = self.records["data"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, k):
+        """time stamp(s) and data of sample(s) k"""
+        return self.tstamps[k], self.data[k]
+
+    def close(self):
+        # release memory map
+        self.records = self.tstamps = self.data = None
+
+
+def readCSV(fname, sep=","):
+    """read csv file written by DataRecorder
+
+    Returns: channel tags, logging interval, start time, data of shape (Nsamples, NChannels)
+    """
+    with open(fname, "r") as f:
+        lines = f.read().splitlines()
+    try:  # start time and logging interval from header
+        T0 = time.mktime(time.strptime(lines[0].split()[-1], "%y%m%d-%H%M"))
+    except (IndexError, ValueError):
+        T0 = 0.0
+    try:
+        dT = float(lines[1].split()[-1])
+    except (IndexError, ValueError):
+        dT = 1.0
+    tags = lines[2][1:].strip().split(sep)
+    data = np.loadtxt(lines, delimiter=sep, ndmin=2)
+    return tags, dT, T0, data
+
+
+def csv2bin(csvname, binname=None, sep=",", dtype="float32"):
+    """convert csv file of DataRecorder to binary format, time stamps from logging interval
+
+    Returns: name of binary file
+    """
+    if binname is None:
+        binname = os.path.splitext(csvname)[0] + ".pdaq"
+    tags, dT, T0, data = readCSV(csvname, sep)
+    w = BinaryWriter(binname, tags, dT, dtype, T0)
+    w.write(data, T0 + dT * np.arange(len(data)))
+    w.close()
+    return binname
+
+
+def bin2csv(binname, csvname=None, sep=",", fmt="%.7g"):
+    """convert binary file to csv format of DataRecorder (time stamps are dropped)
+
+    Returns: name of csv file
+    """
+    if csvname is None:
+        csvname = os.path.splitext(binname)[0] + ".csv"
+    r = BinaryReader(binname)
+    with open(csvname, "w") as f:
+        print("# PhyPiDAQ Data recorder ", time.strftime("%y%m%d-%H%M", time.localtime(r.StartTime)), file=f)
+        print("#   logging interval {0:.3g}".format(r.Interval), file=f)
+        print("# " + sep.join(r.ChanTags), file=f)
+        linefmt = sep.replace("%", "%%").join([fmt] * r.NChannels) + "\n"
+        for k in range(0, len(r), 10000):  # in chunks, to limit memory use
+            chunk = r.data[k : k + 10000]
+            f.write((linefmt * len(chunk)) % tuple(chunk.ravel()))
+    r.close()
+    return csvname
+
+
+def packFrame(seq, tstamps, data, dtype="float32"):
+    """pack block of samples into frame
+
+    Args:
+      seq:     sequence number of first sample
+      tstamps: array of n time stamps
+      data:    array of shape (n, NChannels)
+      dtype:   data type of values, float32 or float64
+
+    Returns: bytes
+    """
+    data = np.atleast_2d(np.asarray(data, dtype=np.dtype(dtype).newbyteorder("<")))
+    n, NChannels = data.shape
+    header = FRAME_HEADER.pack(FRAME_MAGIC, n, NChannels, data.itemsize, seq)
+    return header + np.asarray(tstamps, dtype="<f8").tobytes() + data.tobytes()
+
+
+def unpackFrame(buf, offset=0):
+    """unpack frame starting at position offset of buf
+
+    Returns: sequence number of first sample, time stamps, data of shape (n, NChannels),
+             position after frame; or None if buf does not contain the complete frame
+    """
+    if len(buf) - offset < FRAME_HEADER.size:
+        return None
+    magic, n, NChannels, itemsize, seq = FRAME_HEADER.unpack_from(buf, offset)
+    if magic != FRAME_MAGIC:
+        raise ValueError("not a PhyPiDAQ data frame")
+    start = offset + FRAME_HEADER.size
+    end = start + 8 * n + itemsize * n * NChannels
+    if len(buf) < end:
+        return None
+    tstamps = np.frombuffer(buf, dtype="<f8", count=n, offset=start)
+    data = np.frombuffer(buf, dtype="<f{0}".format(itemsize), count=n * NChannels, offset=start + 8 * n)
+    return seq, tstamps, data.reshape(n, NChannels), end
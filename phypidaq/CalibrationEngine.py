@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""vectorized calibration of channel values for PhyPiDAQ
+
+The interpolating splines generated from the calibration tables in
+`ChanCalib` (see helpers.generateCalibrationFunction) are converted
+once to piece-wise polynomials. Coefficients of all channels are
+stored in common arrays, so that the calibration of all channels is
+applied by a few numpy operations, for single samples
+(shape (NChannels,)) as well as for blocks of samples
+(shape (NSamples, NChannels)).
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np
+from scipy.interpolate import PPoly
+
+from .helpers import generateCalibrationFunction
+
+
+def spline2pp(spline):
+    """convert an interpolating UnivariateSpline to polynomial pieces
+
+    Returns:
+      breakpoints:  left edges of the polynomial pieces and right edge of last one
+      coefficients: array (NPieces, 4), highest power first, cubic polynomials in (x - left edge)
+    """
+    k = len(spline.get_coeffs()) - len(spline.get_knots()) + 1  # degree of spline
+    knots = spline.get_knots()
+    t = np.concatenate(([knots[0]] * k, knots, [knots[-1]] * k))
+    pp = PPoly.from_spline((t, spline.get_coeffs(), k))
+    # remove pieces of zero length at both ends
+    keep = np.diff(pp.x) > 0.0
+    c = pp.c[:, keep].T
+    x = np.append(pp.x[:-1][keep], pp.x[-1])
+    # pad to third order
+    coeffs = np.zeros((len(c), 4))
+    coeffs[:, 4 - c.shape[1] :] = c
+    return x, coeffs
+
+
+class CalibrationEngine(object):
+    """apply calibration of all channels at once
+
+    the polynomial pieces of the calibration functions of all
+    calibrated channels are stored in arrays of common shape;
+    values outside of the calibration range are extrapolated
+    with the first or last polynomial, as done by the splines
+    """
+
+    def __init__(self, calibData, NHWChannels):
+        """Args:
+        calibData:   list of calibration entries for channels, each
+                     None, a calibration factor or [ [true values], [raw values] ]
+        NHWChannels: number of hardware channels
+        """
+        self.NHWChannels = NHWChannels
+        # indices of calibrated channels
+        self.idx = [i for i in range(min(len(calibData), NHWChannels)) if calibData[i] is not None]
+        self.NCalib = len(self.idx)
+        pieces = [spline2pp(generateCalibrationFunction(calibData[i])) for i in self.idx]
+
+        NPieces = max([len(c) for x, c in pieces] + [1])
+        # inner breakpoints, padded with inf to never be exceeded
+        self.inner = np.full((self.NCalib, max(NPieces - 1, 1)), np.inf)
+        self.left = np.zeros((self.NCalib, NPieces))  # left edges of pieces
+        self.coeffs = np.zeros((self.NCalib, NPieces, 4))  # polynomial coefficients
+        for j, (x, c) in enumerate(pieces):
+            n = len(c)
+            self.inner[j, : n - 1] = x[1:-1]
+            self.left[j, :n] = x[:-1]
+            self.coeffs[j, :n] = c
+        self.chan = np.arange(self.NCalib)
+
+    def __call__(self, data):
+        """apply calibration to data in place
+
+        Args:
+          data: array of shape (NChannels,) or (NSamples, NChannels)
+        Returns: data
+        """
+        if not self.NCalib:
+            return data
+        v = data[..., self.idx]
+        # index of polynomial piece for each value
+        ip = (v[..., None] >= self.inner).sum(axis=-1)
+        c = self.coeffs[self.chan, ip]
+        dx = v - self.left[self.chan, ip]
+        data[..., self.idx] = ((c[..., 0] * dx + c[..., 1]) * dx + c[..., 2]) * dx + c[..., 3]
+        return data
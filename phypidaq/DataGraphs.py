@@ -5,6 +5,8 @@ from __future__ import absolute_import
 import numpy as np
 import matplotlib.pyplot as plt
 
+from .HistoryBuffer import MinMaxHistory
+
 
 class DataGraphs(object):
     """Bar graph display, history plot and XY-display
@@ -17,15 +19,6 @@ class DataGraphs(object):
 
         # get relevant settings from PhyPiConfDict
         self.dT = ConfDict['Interval']
-        if self.dT < 60:
-            self.tUnit = 's'
-            self.tUnitFactor = 1.0
-        elif self.dT < 3600:
-            self.tUnit = 'min'
-            self.tUnitFactor = 1.0 / 60.0
-        else:
-            self.tUnit = 'h'
-            self.tUnitFactor = 1.0 / 3600.0
 
         self.NChan = ConfDict['NChannels']
 
@@ -93,17 +86,24 @@ class DataGraphs(object):
 
         # number of points for history
         if 'NHistoryPoints' in ConfDict:
-            self.Npoints = min(ConfDict['NHistoryPoints'], 250)
+            self.Npoints = ConfDict['NHistoryPoints']
         else:
             self.Npoints = 120
+        # unit of time axis according to length of history
+        if self.dT * self.Npoints < 1800:
+            self.tUnit = 's'
+            self.tUnitFactor = 1.0
+        elif self.dT * self.Npoints < 36000:
+            self.tUnit = 'min'
+            self.tUnitFactor = 1.0 / 60.0
+        else:
+            self.tUnit = 'h'
+            self.tUnitFactor = 1.0 / 3600.0
 
         # config data needed throughout the class
         self.Ti = self.dT * np.linspace(-self.Npoints + 1, 0, self.Npoints) * self.tUnitFactor
         self.bwidth = 0.5  # width of bars
         self.ind = self.bwidth + np.arange(Nc)  # bar position
-        #
-        self.Vhist = np.zeros([Nc, self.Npoints])
-        self.h = np.zeros([Nc, self.Npoints])
 
         # set up a figure to plot value(s)
         if self.XYmode:
@@ -112,6 +112,8 @@ class DataGraphs(object):
         else:
             fig = plt.figure("DataGraphs", figsize=(4.0, 5.3))
             fig.subplots_adjust(left=0.2, bottom=0.1, right=0.8, top=0.94, wspace=None, hspace=0.25)
+        # history at full resolution, plotted as min/max envelope sized to width of figure
+        self.hist = MinMaxHistory(self.Npoints, Nc, NPixels=int(fig.get_size_inches()[0] * fig.dpi))
 
         axes = []
         if not self.XYmode:  # only history plot
@@ -236,16 +238,18 @@ class DataGraphs(object):
     def __call__(self, data):
         # update graphics with actual data
         if data is not None:
+            # dat is one sample or a batch of samples (one per row), n the number of the latest sample
             n, dat = data
 
-            k = (n - 1) % self.Npoints
+            self.hist.append(dat, n)
+            x, h = self.hist.envelope()  # min/max envelope of history
+            t = x * self.dT * self.tUnitFactor
+            dat = self.hist.full.latest()  # latest sample for bar chart and text
             txt = ''
             for i in range(self.NChan):
-                self.Vhist[i, k] = dat[i]
                 # update history graph
-                self.h[i] = np.concatenate((self.Vhist[i, k + 1 :], self.Vhist[i, : k + 1]), axis=0)
                 # if n > 1: # !!! fix to avoid permanent display of first object in blit mode
-                self.graphs[i].set_data(self.Ti, self.h[i])
+                self.graphs[i].set_data(t, h[i])
                 # update text display
                 if i % 2:
                     bgn = '  '
@@ -253,17 +257,17 @@ class DataGraphs(object):
                 else:
                     bgn = ''
                     end = ''
-                txt += bgn + '%s: % #.4g%s' % (self.ChanNams[i], self.Vhist[i, k], self.ChanUnits[i]) + end
+                txt += bgn + '%s: % #.4g%s' % (self.ChanNams[i], dat[i], self.ChanUnits[i]) + end
                 # update bar chart
                 self.bgraphs[i].set_height(dat[i])
                 self.animtxt.set_text(txt)
             if self.XYmode:
-                # update XY display
+                # update XY display with latest samples, as many as fit into history plot
+                h = self.hist.latest(2 * self.hist.NBuckets)
                 for i in range(len(self.XYgraphs)):
                     cx = self.xyPlots[i][0]
                     cy = self.xyPlots[i][1]
-                    i1 = max(0, self.Npoints - n)
-                    self.XYgraphs[i].set_data(self.h[cx, i1:], self.h[cy, i1:])
+                    self.XYgraphs[i].set_data(h[cx], h[cy])
         # -- end if is not None
         return self.bgraphs + self.graphs + self.XYgraphs + (self.animtxt,)
 
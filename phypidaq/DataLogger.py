@@ -4,6 +4,8 @@ from __future__ import absolute_import
 import numpy as np
 import matplotlib.pyplot as plt
 
+from .HistoryBuffer import MinMaxHistory
+
 
 class DataLogger(object):
     """history of input data
@@ -20,7 +22,7 @@ class DataLogger(object):
 
         # number of points for history
         if 'NHistoryPoints' in ConfDict:
-            self.Npoints = min(ConfDict['NHistoryPoints'], 250)
+            self.Npoints = ConfDict['NHistoryPoints']
         else:
             self.Npoints = 120
 
@@ -86,10 +88,6 @@ class DataLogger(object):
 
         self.graphs_initialized = False
 
-        # data structures needed throughout the class
-        self.Vhist = np.zeros([Nc, self.Npoints])
-        self.h = np.zeros([Nc, self.Npoints])
-
         # create matplotlib figure object
         if self.XYmode:
             self.fig = plt.figure("DataLogger", figsize=(6.3, 6.0))
@@ -98,6 +96,9 @@ class DataLogger(object):
             self.fig = plt.figure("DataLogger", figsize=(6.0, 3.0))
             self.fig.subplots_adjust(left=0.15, bottom=0.15, right=0.85, top=0.95, wspace=None, hspace=0.25)
 
+        # history at full resolution, plotted as min/max envelope sized to width of figure
+        self.hist = MinMaxHistory(self.Npoints, Nc, NPixels=int(self.fig.get_size_inches()[0] * self.fig.dpi))
+
     # -- end def __init__()
 
     def initgraph(self, NPoints):
@@ -144,11 +145,11 @@ class DataLogger(object):
     # -- end def initgraph()
 
     def get_Ti(self, NPoints):
-        # determine points on time-axis
-        if self.dT < 60:
+        # determine points on time-axis, unit chosen according to length of history
+        if self.dT * NPoints < 1800:
             self.tUnit = 's'
             self.tUnitFactor = 1.0
-        elif self.dT < 3600:
+        elif self.dT * NPoints < 36000:
             self.tUnit = 'min'
             self.tUnitFactor = 1.0 / 60.0
         else:
@@ -187,26 +188,27 @@ class DataLogger(object):
     # -- end DataLogger.init()
 
     def __call__(self, data):
-        # add data for last point in time (for animated plot)
+        # add data for last point(s) in time (for animated plot)
+        #   data = (n, dat): dat is one sample or a batch of samples (one per row),
+        #                    n is the number of the latest sample
         if data is not None:
             n, dat = data
 
-            k = (n - 1) % self.Npoints
-            for i in range(self.NChan):
-                self.Vhist[i, k] = dat[i]
-                self.h[i] = np.concatenate((self.Vhist[i, k + 1 :], self.Vhist[i, : k + 1]), axis=0)
+            self.hist.append(dat, n)
             if not self.XYmode:
-                # update history graph(s)
+                # update history graph(s) with min/max envelope of history
+                x, h = self.hist.envelope()
+                t = x * self.dT * self.tUnitFactor
                 for i in range(self.NChan):
                     # if n>1: # !!! fix to avoid permanent display of first object in blit mode
-                    self.graphs[i].set_data(self.Ti, self.h[i])
+                    self.graphs[i].set_data(t, h[i])
             else:
-                # update XY display
+                # update XY display with latest samples, as many as fit into history plot
+                h = self.hist.latest(2 * self.hist.NBuckets)
                 for i in range(len(self.graphs)):
                     cx = self.xyPlots[i][0]
                     cy = self.xyPlots[i][1]
-                    i1 = max(0, self.Npoints - n)
-                    self.graphs[i].set_data(self.h[cx, i1:], self.h[cy, i1:])
+                    self.graphs[i].set_data(h[cx], h[cy])
         return self.graphs
 
     # - -end def DataLogger.__call__
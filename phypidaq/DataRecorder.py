@@ -1,24 +1,53 @@
 from __future__ import print_function, division, unicode_literals
 from __future__ import absolute_import
 
+import os
+import threading
 import time
+import numpy as np
+
+from .BinaryData import BinaryWriter
+from .SegmentArchive import SegmentArchive
 
 
 class DataRecorder(object):
-    """store data to fle"""
+    """store data to fle
+
+    Samples are collected in a block of fixed size and formatted block-wise,
+    or the csv text of the values is taken from the caller (e.g. Block.csv()
+    of the output bus, formatted once for all text outputs); the block is
+    written when full, or when its oldest sample is older than
+    FlushInterval seconds. File buffers are flushed at the same time, so at
+    most the last FlushInterval seconds of data are lost if PhyPiDAQ crashes;
+    a background thread writes the block if no further samples arrive (e.g.
+    in paused mode or with long logging intervals).
+
+    Files with extension .pdaq are written in binary format (see BinaryData),
+    with data type given by option DataPrecision (float32 or float64).
+
+    For long-term recordings, a new file (segment) is started when the current
+    one exceeds RotateSize MB or is older than RotateInterval seconds; closed
+    segments are compressed in background (option Compression: gzip, xz or
+    zstd) and listed in an index file with their time ranges (SegmentArchive).
+    """
 
-    def __init__(self, Fname, ConfDict):
+    def __init__(self, Fname, ConfDict, NBuffer=1000):
         """Args:
 
         Fname: file name
         ConfDict: configuration dictionary
-        delim: field separator
+        NBuffer: number of samples collected before writing
         """
 
         if 'CSVseparator' in ConfDict:
             self.sep = ConfDict['CSVseparator']
         else:
             self.sep = ','
+        # maximum time (s) data are kept in memory, 0 to write immediately
+        if 'FlushInterval' in ConfDict:
+            self.flushInterval = ConfDict['FlushInterval']
+        else:
+            self.flushInterval = 1.0
         self.dT = ConfDict['Interval']
         self.NChan = ConfDict['NChannels']
         self.ChanLim = ConfDict['ChanLimits']
@@ -37,28 +66,202 @@ class DataRecorder(object):
             self.ChanTags.append(c + ':' + ChanLabels[i] + '(' + ChanUnits[i] + ')')
 
         fname = Fname.split('.')
-        fnam = fname[0]
+        self.fnam = fname[0]
         if len(fname) > 1:
-            fext = fname[1]
+            self.fext = fname[1]
+        else:
+            self.fext = 'dat'
+        self.T0 = time.time()
+        self.datetime = time.strftime('%y%m%d-%H%M', time.localtime(self.T0))
+
+        self.binary = self.fext == 'pdaq'
+        if 'DataPrecision' in ConfDict:
+            self.dtype = ConfDict['DataPrecision']
+        else:
+            self.dtype = 'float32'
+
+        # rotation of files and compression of closed segments
+        if 'RotateSize' in ConfDict and ConfDict['RotateSize']:
+            self.rotateSize = ConfDict['RotateSize'] * 1e6
+        else:
+            self.rotateSize = None
+        if 'RotateInterval' in ConfDict and ConfDict['RotateInterval']:
+            self.rotateInterval = ConfDict['RotateInterval']
+        else:
+            self.rotateInterval = None
+        if 'Compression' in ConfDict:
+            compression = ConfDict['Compression']
+        else:
+            compression = None
+        self.rotate = self.rotateSize is not None or self.rotateInterval is not None
+        if self.rotate or compression is not None:
+            self.archive = SegmentArchive(self.fnam + '_' + self.datetime + '.idx', compression)
+        else:
+            self.archive = None
+        self.Nseg = 0  # number of segments
+        self.openSegment()
+
+        # block of samples to be written and format of one line
+        self.NBuffer = NBuffer
+        if self.binary:
+            self.buf = np.zeros((NBuffer, self.NChan))
+            self.tbuf = np.zeros(NBuffer)  # time stamps
+        self.lines = []  # text of samples in csv format
+        self.tspan = [0.0, 0.0]  # time stamps of first and last sample in block
+        self.nbuf = 0  # number of samples in block
+        self.Nrec = 0  # number of samples recorded
+        self.tfirst = 0.0  # time of oldest sample in block
+        self.linefmt = self.sep.replace('%', '%%').join(['%.4g'] * self.NChan) + '\n'
+
+        # write block after FlushInterval also if no further samples arrive
+        self.cond = threading.Condition()
+        self.closed = False
+        if self.flushInterval > 0:
+            self.flushThread = threading.Thread(target=self._flushTimer, name='DataRecorder')
+            self.flushThread.daemon = True
+            self.flushThread.start()
+        else:
+            self.flushThread = None
+
+    def _flushTimer(self):
+        """flush block when its oldest sample is FlushInterval seconds old"""
+        with self.cond:
+            while not self.closed:
+                if self.nbuf:
+                    dt = self.tfirst + self.flushInterval - time.time()
+                    if dt <= 0.0:
+                        self.flush()
+                        continue
+                else:
+                    dt = None  # wait for first sample of next block
+                self.cond.wait(dt)
+
+    def openSegment(self):
+        """open new output file and write header"""
+        self.segStart = time.time()
+        datetime = time.strftime('%y%m%d-%H%M', time.localtime(self.segStart))
+        if self.rotate:  # numbered segments
+            fname = '{0}_{1}_{2:04d}.{3}'.format(self.fnam, self.datetime, self.Nseg, self.fext)
+        else:
+            fname = self.fnam + '_' + datetime + '.' + self.fext
+        self.Nseg += 1
+        self.segSamples = 0  # samples and ...
+        self.segBytes = 0  # ... bytes written to segment
+        self.segTimes = [0.0, 0.0]  # time stamps of first and last sample
+
+        if self.binary:
+            self.writer = BinaryWriter(fname, self.ChanTags, self.dT, self.dtype, self.segStart)
+            self.f = self.writer.f
+        else:
+            self.f = open(fname, 'w')
+            # write header:
+            print('# PhyPiDAQ Data recorder ', datetime, file=self.f)
+            print('#   logging interval {0:.3g}'.format(self.dT), file=self.f)
+            print('# ', end='', file=self.f)
+            print(self.sep.join(self.ChanTags), file=self.f)
+            self.f.flush()
+
+    def closeSegment(self):
+        """close output file and pass it to archive"""
+        self.f.close()
+        if self.archive is not None:
+            self.archive.add(self.f.name, self.segTimes[0], self.segTimes[1], self.segSamples)
+
+    def __call__(self, data, tstamps=None, text=None):
+        """record one sample or a block of samples (one sample per row)
+
+        tstamps: time stamp(s) of sample(s), only stored in binary format;
+                 start time + multiples of logging interval if None
+        text: function returning the values as csv text (e.g. Block.csv),
+              used in csv format instead of formatting the data here
+        """
+        if data is None or not np.size(data):
+            return
+        data = np.atleast_2d(data)
+        if tstamps is None:
+            tstamps = self.T0 + self.dT * np.arange(self.Nrec, self.Nrec + len(data))
         else:
-            fext = 'dat'
-        datetime = time.strftime('%y%m%d-%H%M', time.localtime())
-        self.f = open(fnam + '_' + datetime + '.' + fext, 'w')
+            tstamps = np.atleast_1d(tstamps)
+        with self.cond:
+            self.Nrec += len(data)
+            if not self.binary:
+                if self.nbuf == 0:
+                    self.tfirst = time.time()
+                    self.cond.notify()  # start flush timer
+                    self.tspan[0] = tstamps[0]
+                self.tspan[1] = tstamps[-1]
+                self.lines.append(self.format(data, text))
+                self.nbuf += len(data)
+                if self.nbuf >= self.NBuffer:
+                    self.flush()
+            else:
+                i = 0
+                while i < len(data):
+                    if self.nbuf == 0:
+                        self.tfirst = time.time()
+                        self.cond.notify()  # start flush timer
+                    m = min(len(data) - i, self.NBuffer - self.nbuf)
+                    self.buf[self.nbuf : self.nbuf + m] = data[i : i + m, : self.NChan]
+                    self.tbuf[self.nbuf : self.nbuf + m] = tstamps[i : i + m]
+                    self.nbuf += m
+                    i += m
+                    if self.nbuf == self.NBuffer:
+                        self.flush()
+            if self.nbuf and time.time() - self.tfirst >= self.flushInterval:
+                self.flush()
 
-        # write header:
-        print('# PhyPiDAQ Data recorder ', datetime, file=self.f)
-        print('#   logging interval {0:.3g}'.format(self.dT), file=self.f)
-        print('# ', end='', file=self.f)
-        print(self.sep.join(self.ChanTags), file=self.f)
+    def format(self, data, text=None):
+        """csv lines of samples, text of values from function text if given"""
+        if text is None or data.shape[1] != self.NChan:
+            # format all lines of block in one operation
+            return (self.linefmt * len(data)) % tuple(data[:, : self.NChan].ravel())
+        txt = text()
+        return txt if self.sep == ',' else txt.replace(',', self.sep)
 
-    def __call__(self, data):
-        if data is not None:
-            print(self.sep.join(['{0:.4g}'.format(d) for d in data]), file=self.f)
+    def flush(self):
+        """write collected samples and flush file buffers"""
+        if self.nbuf:
+            if self.binary:
+                self.writer.write(self.buf[: self.nbuf], self.tbuf[: self.nbuf])
+                self.segBytes += self.nbuf * self.writer.record.itemsize
+                self.tspan = [self.tbuf[0], self.tbuf[self.nbuf - 1]]
+            else:
+                txt = ''.join(self.lines)
+                self.lines = []
+                self.f.write(txt)
+                self.segBytes += len(txt)
+            if self.segSamples == 0:
+                self.segTimes[0] = self.tspan[0]
+            self.segTimes[1] = self.tspan[1]
+            self.segSamples += self.nbuf
+            self.nbuf = 0
+        self.f.flush()
+        # start new segment if required
+        if self.rotate and self.segSamples:
+            if (self.rotateSize is not None and self.segBytes >= self.rotateSize) or (
+                self.rotateInterval is not None and time.time() - self.segStart >= self.rotateInterval
+            ):
+                self.closeSegment()
+                self.openSegment()
 
     def close(self):
         # explicit close method
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.flushThread is not None:
+            self.flushThread.join()
+            self.flushThread = None
         if not self.f.closed:
-            self.f.close()
+            self.flush()
+            if self.rotate and self.segSamples == 0:  # remove empty segment
+                self.f.close()
+                os.remove(self.f.name)
+            else:
+                self.closeSegment()
+        if self.archive is not None:
+            self.archive.close()  # wait for compression of last segment
+            self.archive = None
 
 
 #  def __del__(self):
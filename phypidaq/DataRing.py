@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""ring buffer for samples with time stamps
+
+preallocated numpy arrays hold the latest N samples; data are written
+by one producer (e.g. the acquisition thread) and read by several
+consumers, each at its own pace. Samples are counted by a sequence
+number, so that a consumer can ask for all samples written since the
+last sample it has seen.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import threading
+import numpy as np
+
+
+class DataRing(object):
+    """ring buffer of N samples with NChannels channels and time stamps"""
+
+    def __init__(self, N, NChannels, dtype=np.float64):
+        """Args:
+        N:         number of samples kept in buffer
+        NChannels: number of channels per sample
+        """
+        self.N = N
+        self.NChannels = NChannels
+        self.data = np.zeros((N, NChannels), dtype=dtype)
+        self.tstamps = np.zeros(N)
+        self.seq = 0  # sequence number of next sample = number of samples written
+        self.lock = threading.Lock()
+
+    def write(self, data, tstamps):
+        """store one sample or a block of samples
+
+        Args:
+          data:    array of shape (NChannels,) or (n, NChannels)
+          tstamps: time stamp or array of n time stamps
+        """
+        data = np.atleast_2d(data)
+        tstamps = np.atleast_1d(tstamps)
+        n = len(data)
+        if n > self.N:  # keep only the latest N samples
+            with self.lock:
+                self.seq += n - self.N
+            data = data[-self.N :]
+            tstamps = tstamps[-self.N :]
+            n = self.N
+        with self.lock:
+            k = self.seq % self.N
+            n1 = min(n, self.N - k)  # samples up to end of buffer ...
+            self.data[k : k + n1] = data[:n1, : self.NChannels]
+            self.tstamps[k : k + n1] = tstamps[:n1]
+            if n1 < n:  # ... and remaining samples at start
+                self.data[: n - n1] = data[n1:, : self.NChannels]
+                self.tstamps[: n - n1] = tstamps[n1:]
+            self.seq += n
+
+    def read(self, seq, nmax=None):
+        """return copies of all samples written since sequence number seq
+
+        Args:
+          seq:  sequence number of first sample to read
+          nmax: maximum number of samples to return
+
+        Returns:
+          next sequence number to read,
+          data of shape (n, NChannels), time stamps,
+          number of lost samples (overwritten before being read)
+        """
+        with self.lock:
+            last = self.seq
+            first = max(seq, last - self.N)
+            if nmax is not None:
+                last = min(last, first + nmax)
+            idx = np.arange(first, last) % self.N
+            data = self.data[idx]
+            tstamps = self.tstamps[idx]
+        return last, data, tstamps, first - seq
+
+    def latest(self):
+        """return latest sample and its time stamp (or None, None if empty)"""
+        with self.lock:
+            if self.seq == 0:
+                return None, None
+            k = (self.seq - 1) % self.N
+            return self.data[k].copy(), self.tstamps[k]
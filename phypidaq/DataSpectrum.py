@@ -104,14 +104,18 @@ class DataSpectrum(object):
     def __call__(self, data):
         if data is not None:
             n, dat = data
+            # sum batch of spectra (one per row) received since last frame
+            dat = np.atleast_2d(dat)
+            m = len(dat)
+            dat = dat.sum(axis=0)
             # add data to histogram
             self.cumulative_counts += dat
             self.line.set_ydata(self.cumulative_counts)
-            self.line_diff.set_ydata(dat)
-            rate = np.sum(dat) / self.dT
+            self.line_diff.set_ydata(dat / m)
+            rate = np.sum(dat) / (m * self.dT)
             Ntot = np.sum(self.cumulative_counts)
             Sum_x = np.sum(self.cumulative_counts * self.xValues)
-            sum_x = np.sum(dat * self.xValues) / self.dT
+            sum_x = np.sum(dat * self.xValues) / (m * self.dT)
             self.animtxtE.set_text(f"#: {Ntot:.5g} \n" + f"$\\Sigma_x$:  {Sum_x:.4g} {self.xUnit}")
             self.animtxt_diff.set_text(f"rate:   {rate:.3g} Hz\n" + f"$\\Sigma_x$:  {sum_x:.4g} {self.xUnit}/s")
         return (self.line, self.line_diff, self.animtxtE, self.animtxt_diff)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""concurrent read-out of several devices
+
+ParallelReadout:
+  Each device is read in a worker thread of a thread pool; data are
+  stored directly at the position of the first channel of each device
+  in the common data buffer. The duration of a read-out cycle is thus
+  given by the slowest device, not by the sum of all read-out times.
+
+ScheduledReadout:
+  Devices with an own read-out interval are polled by a background
+  thread each, on their own time line, while data taking is active.
+  The latest values of these devices are inserted into the data stream
+  (sample-and-hold), so slow devices do not throttle fast ones.
+
+Devices on the same bus (option Bus in the device configuration, e.g.
+"i2c-1"; all devices without this option are assumed to share one bus)
+are never accessed at the same time: each read-out holds the lock of
+the bus of the device.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def busLocks(Buses):
+    """one lock per bus name, shared by all devices on this bus"""
+    locks = {}
+    return [locks.setdefault(bus, threading.Lock()) for bus in Buses]
+
+
+class ParallelReadout(object):
+    """read all devices concurrently, one worker thread per device"""
+
+    def __init__(self, DEVs, ChanIdx_ofDevice, Locks=None):
+        """Args:
+        DEVs:             list of device instances
+        ChanIdx_ofDevice: index of first channel of each device in data buffer
+        Locks:            lock of the bus of each device (see busLocks()), one common lock if None
+        """
+        self.DEVs = DEVs
+        self.ChanIdx_ofDevice = ChanIdx_ofDevice
+        self.Locks = busLocks([None] * len(DEVs)) if Locks is None else Locks
+        self.pool = ThreadPoolExecutor(max_workers=len(DEVs), thread_name_prefix="DeviceReadout")
+
+    def _acquireData(self, i, buf):
+        with self.Locks[i]:
+            self.DEVs[i].acquireData(buf)
+
+    def _acquireBlock(self, i, buf, n):
+        with self.Locks[i]:
+            return self.DEVs[i].acquireBlock(buf, n)
+
+    def acquireData(self, buf):
+        """read one sample from all devices into buf"""
+        futures = [
+            self.pool.submit(self._acquireData, i, buf[self.ChanIdx_ofDevice[i] :]) for i in range(len(self.DEVs))
+        ]
+        for f in futures:
+            f.result()  # wait for all devices, re-raise exceptions
+
+    def acquireBlock(self, buf, n):
+        """read n samples from all devices into buf (one sample per row)
+
+        Returns: time stamps of the first device
+        """
+        futures = [
+            self.pool.submit(self._acquireBlock, i, buf[:, self.ChanIdx_ofDevice[i] :], n)
+            for i in range(len(self.DEVs))
+        ]
+        results = [f.result() for f in futures]
+        return results[0]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+class ScheduledReadout(object):
+    """read devices with individual read-out intervals
+
+    devices without own interval are read in every read-out cycle
+    (concurrently, if parallel is True), devices with own interval are
+    polled in background threads and their latest values are held
+    until the next reading; values are NaN before the first reading
+
+    polling starts with start() in paused mode, use resume() and pause()
+    to follow the state of data taking
+    """
+
+    def __init__(self, DEVs, ChanIdx_ofDevice, Intervals, parallel=True, Buses=None):
+        """Args:
+        DEVs:             list of device instances
+        ChanIdx_ofDevice: index of first channel of each device in data buffer
+        Intervals:        read-out interval of each device, None for read-out in every cycle
+        parallel:         read devices without own interval concurrently
+        Buses:            name of the bus of each device, None for the common default bus
+        """
+        self.DEVs = DEVs
+        self.ChanIdx_ofDevice = ChanIdx_ofDevice
+        self.Intervals = Intervals
+        self.sync = [i for i, dt in enumerate(Intervals) if dt is None]
+        self.sched = [i for i, dt in enumerate(Intervals) if dt is not None]
+        self.Locks = busLocks([None] * len(DEVs) if Buses is None else Buses)
+
+        if parallel and len(self.sync) > 1:
+            self.syncReadout = ParallelReadout(
+                [DEVs[i] for i in self.sync],
+                [ChanIdx_ofDevice[i] for i in self.sync],
+                [self.Locks[i] for i in self.sync],
+            )
+        else:
+            self.syncReadout = None
+
+        # latest values and number of readings of devices with own interval
+        self.held = {i: np.full(DEVs[i].NChannels, np.nan) for i in self.sched}
+        self.Nreadings = {i: 0 for i in self.sched}
+        self.lock = threading.Lock()
+        self.error = None  # exception in one of the polling threads
+
+        self.stopEvent = threading.Event()
+        self.activeEvent = threading.Event()  # set while data taking is active
+        self.threads = []
+
+    def start(self):
+        """start polling threads (in paused mode, use resume() to start polling)"""
+        for i in self.sched:
+            t = threading.Thread(name="poll_" + type(self.DEVs[i]).__name__, target=self._poll, args=(i,))
+            t.daemon = True
+            self.threads.append(t)
+            t.start()
+
+    def resume(self):
+        self.activeEvent.set()
+
+    def pause(self):
+        self.activeEvent.clear()
+
+    def _poll(self, i):
+        """read device i at fixed intervals, scheduled relative to (re-)start of data taking"""
+        DEV = self.DEVs[i]
+        dt = self.Intervals[i]
+        buf = np.zeros(DEV.NChannels)
+        while not self.stopEvent.is_set():
+            if not self.activeEvent.wait(0.1):
+                continue
+            tstart = time.monotonic()
+            k = 0
+            while self.activeEvent.is_set() and not self.stopEvent.is_set():
+                try:
+                    with self.Locks[i]:
+                        DEV.acquireData(buf)
+                except Exception as e:
+                    self.error = e
+                    return
+                with self.lock:
+                    self.held[i][:] = buf
+                    self.Nreadings[i] += 1
+                k += 1
+                self.stopEvent.wait(max(0.0, tstart + k * dt - time.monotonic()))
+
+    def _insertHeld(self, buf):
+        """copy latest values of polled devices to all samples in buf"""
+        if self.error is not None:
+            raise self.error
+        with self.lock:
+            for i in self.sched:
+                i0 = self.ChanIdx_ofDevice[i]
+                buf[..., i0 : i0 + self.DEVs[i].NChannels] = self.held[i]
+
+    def acquireData(self, buf):
+        """read devices without own interval and add held values of the others"""
+        if self.syncReadout is not None:
+            self.syncReadout.acquireData(buf)
+        else:
+            for i in self.sync:
+                with self.Locks[i]:
+                    self.DEVs[i].acquireData(buf[self.ChanIdx_ofDevice[i] :])
+        self._insertHeld(buf)
+
+    def acquireBlock(self, buf, n):
+        """read n samples (one per row) from devices without own interval,
+        held values of the others are used for all samples
+
+        Returns: time stamps of the first device read in every cycle
+        """
+        if self.syncReadout is not None:
+            ts = self.syncReadout.acquireBlock(buf, n)
+        elif self.sync:
+            tss = []
+            for i in self.sync:
+                with self.Locks[i]:
+                    tss.append(self.DEVs[i].acquireBlock(buf[:, self.ChanIdx_ofDevice[i] :], n))
+            ts = tss[0]
+        else:
+            ts = np.full(n, time.time())
+        self._insertHeld(buf[:n])
+        return ts
+
+    def close(self):
+        self.stopEvent.set()
+        self.activeEvent.set()
+        for t in self.threads:
+            t.join(timeout=2.0)
+        if self.syncReadout is not None:
+            self.syncReadout.close()
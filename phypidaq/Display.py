@@ -13,6 +13,7 @@ import sys
 import multiprocessing as mp
 
 from phypidaq._version_info import _get_version_string
+from phypidaq.PluginRegistry import displays
 
 import matplotlib
 from PyQt5 import QtWidgets, QtGui, QtCore
@@ -30,13 +31,14 @@ class Display(QMainWindow):
     QWidget to display a dynamic matplotlib.pyplot in it
     """
 
-    def __init__(self, interval=0.1, config_dict=None, cmd_queue=None, data_queue=None):
+    def __init__(self, interval=0.1, config_dict=None, cmd_queue=None, data_queue=None, data_ring=None):
         """
         :argument:
              interval:    logging interval, eventually overwritten by entry in config_dict
              config_dict: dictionary with configuration
              cmd_queue:   multiprocessing Queue for command transfer to caller
              data_queue:  multiprocessing Queue for data transfer
+             data_ring:   SharedRing for data transfer, replaces data_queue if given
         """
 
         # Setup a basic window
@@ -63,6 +65,7 @@ class Display(QMainWindow):
             self.data_queue = mp.Queue(1)
         else:
             self.data_queue = data_queue
+        self.data_ring = data_ring
 
         if config_dict is not None:
             self.config_dict = config_dict
@@ -77,11 +80,8 @@ class Display(QMainWindow):
             self.config_dict["Interval"] = interval
         else:
             interval = self.config_dict["Interval"]
-        if interval < 0.05:
-            print(" !!! read-out intervals < 0.05 s not reliable, setting to 0.05 s")
-            self.config_dict["Interval"] = 0.05
-            interval = 0.05
-        self.interval = interval
+        # time between frames: samples arriving faster are shown in batches
+        self.interval = max(interval, 0.05)
 
         # XY mode is by default off
         if "XYmode" not in self.config_dict:
@@ -117,33 +117,30 @@ class Display(QMainWindow):
         # Name of the display module
         module_name = self.config_dict["DisplayModule"]
 
-        # TODO: Check if there are safer ways for doing this
-        # import relevant library
+        # import display class (on first use)
         try:
-            command = "from ." + module_name + " import *"
-            exec(command, globals(), globals())
+            DisplayClass = displays.get(module_name)
         except Exception as e:
             print(" !!! Display: failed to import module - exiting")
             print(str(e))
             sys.exit(1)
 
         try:
-            command = "global DG; DG = " + module_name + "(self.config_dict)"
-            exec(command, globals(), locals())
+            self.DG = DisplayClass(self.config_dict)
         except Exception as e:
             print(" !!! Display: failed to initialize module - exiting")
             print(str(e))
             sys.exit(1)
 
         # Init the imported display module
-        DG.init()
+        self.DG.init()
 
         # Get the figure from the display module and add it to the widget of the window
-        dynamic_canvas = FigureCanvas(DG.fig)
+        dynamic_canvas = FigureCanvas(self.DG.fig)
         layout.addWidget(dynamic_canvas)
         layout.addLayout(self.button_layout)
 
-        self.figure = DG.fig
+        self.figure = self.DG.fig
 
         button_h = 24
         button_w = 100
@@ -250,13 +247,22 @@ class Display(QMainWindow):
         self.timer.start()
 
         def yield_event_from_queue():
-            # Receive data via a Queue from package multiprocessing
+            # Receive data via shared memory or via a Queue from package multiprocessing
             cnt = 0
+            seq = 0  # next sample to read from data_ring
             lagging = False
             timestamp_last = time.time()
 
             while True:
-                if not self.data_queue.empty():
+                if self.data_ring is not None:
+                    # pass all samples written since last frame as one batch,
+                    #   together with the number of the latest sample
+                    seq, data, tstamps, lost = self.data_ring.read(seq)
+                    if len(data):
+                        yield seq, data
+                    else:
+                        yield None
+                elif not self.data_queue.empty():
                     data = self.data_queue.get()
                     if not isinstance(data, np.ndarray):
                         break  # Received end event
@@ -283,8 +289,8 @@ class Display(QMainWindow):
             sys.exit()
 
         self.animation = anim.FuncAnimation(
-            DG.fig,
-            DG,
+            self.DG.fig,
+            self.DG,
             yield_event_from_queue,
             interval=50,
             repeat=True,
@@ -1,16 +1,18 @@
 import multiprocessing as mp
-import time
 
 from PyQt5.QtWidgets import QApplication
 
 from phypidaq.Display import Display
+from phypidaq.SharedRing import SharedRing
 
 
 class DisplayManager:
-    def __init__(self, interval=0.1, config_dict=None, cmd_queue=None, data_queue=None):
+    def __init__(self, interval=0.1, config_dict=None, cmd_queue=None, data_queue=None, ring_size=4096):
         self.processes = []
         self.cmd_queue = cmd_queue
-        self.data_queue = data_queue
+        self.data_queue = data_queue  # not used, data are passed via shared memory
+        self.ring_size = ring_size  # number of samples kept for display process
+        self.data_ring = None
 
         self.interval = interval
 
@@ -20,10 +22,10 @@ class DisplayManager:
             self.config_dict = {}
 
     def init(self):
-        # Create queue if not set
-        if self.data_queue is None:
-            # Queue for data transfer to sub-process
-            self.data_queue = mp.Queue(1)
+        # ring buffer in shared memory for data transfer to sub-process
+        if "NChannels" not in self.config_dict:
+            self.config_dict["NChannels"] = 1
+        self.data_ring = SharedRing(self.ring_size, self.config_dict["NChannels"])
 
         # Create a new process
         self.processes.append(mp.Process(name="Display instance", target=self.spawnWindow))
@@ -36,15 +38,15 @@ class DisplayManager:
 
     def spawnWindow(self):
         app = QApplication([None])
-        display = Display(self.interval, self.config_dict, self.cmd_queue, self.data_queue)
+        display = Display(self.interval, self.config_dict, self.cmd_queue, data_ring=self.data_ring)
         display.show()
         app.exec()
 
-    def showData(self, dat):
-        # Send data to display process
-        self.data_queue.put(dat)
-        # Waiting time to make data transfer reliable
-        time.sleep(0.00005)
+    def showData(self, dat, tstamps=None):
+        """send one sample or a block of samples (one per row) to display process,
+        never blocks: the display picks up data at its own pace
+        """
+        self.data_ring.write(dat, tstamps)
 
     def close(self):
         # Shut-down all sub-process(es)
@@ -52,3 +54,6 @@ class DisplayManager:
             if p.is_alive():
                 p.terminate()
                 print('Terminating ' + p.name)
+        if self.data_ring is not None:
+            self.data_ring.close()
+            self.data_ring = None
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""compiled formula engine for PhyPiDAQ
+
+Formulae given as python expressions in the configuration entry
+`ChanFormula` are checked and compiled once. The resulting object
+is called on the data array and works on a single sample
+(shape (NChannels,)) as well as on a block of samples
+(shape (NSamples, NChannels)).
+
+Only the hardware channels c0, c1, ... and the functions and
+constants of the python `math` module (plus abs, min, max and round)
+may be used in formulae; the math functions are replaced by their
+numpy equivalents to work on arrays. Conditional expressions
+(x if cond else y), the operators and, or, not and chained comparisons
+(1 < c0 < 3) are rewritten to element-wise numpy operations.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import ast
+import math
+from functools import reduce
+
+import numpy as np
+
+
+def _log(x, base=None):
+    # math.log() accepts an optional base
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+# numpy equivalents of functions from the math module
+_npFuncs = {
+    "acos": np.arccos,
+    "acosh": np.arccosh,
+    "asin": np.arcsin,
+    "asinh": np.arcsinh,
+    "atan": np.arctan,
+    "atan2": np.arctan2,
+    "atanh": np.arctanh,
+    "ceil": np.ceil,
+    "copysign": np.copysign,
+    "cos": np.cos,
+    "cosh": np.cosh,
+    "degrees": np.degrees,
+    "exp": np.exp,
+    "expm1": np.expm1,
+    "fabs": np.fabs,
+    "floor": np.floor,
+    "fmod": np.fmod,
+    "hypot": np.hypot,
+    "isfinite": np.isfinite,
+    "isinf": np.isinf,
+    "isnan": np.isnan,
+    "log": _log,
+    "log10": np.log10,
+    "log1p": np.log1p,
+    "log2": np.log2,
+    "pow": np.power,
+    "radians": np.radians,
+    "sin": np.sin,
+    "sinh": np.sinh,
+    "sqrt": np.sqrt,
+    "tan": np.tan,
+    "tanh": np.tanh,
+    "trunc": np.trunc,
+    # some builtins commonly used in formulae
+    "abs": np.abs,
+    "min": lambda *a: reduce(np.minimum, a),
+    "max": lambda *a: reduce(np.maximum, a),
+    "round": np.round,
+}
+
+
+def _makeNamespace():
+    """whitelisted names: math functions and constants"""
+    ns = {}
+    for name in dir(math):
+        if name.startswith("_"):
+            continue
+        obj = getattr(math, name)
+        if name in _npFuncs:
+            ns[name] = _npFuncs[name]
+        elif callable(obj):
+            # no numpy equivalent (e.g. erf, gamma), apply element-wise
+            ns[name] = np.vectorize(obj, otypes=[float])
+        else:
+            ns[name] = obj  # constants pi, e, tau, inf, nan
+    for name in ("abs", "min", "max", "round"):
+        ns[name] = _npFuncs[name]
+    return ns
+
+
+# element-wise equivalents of and, or, not and if-else, same results as in python
+_elementWise = {
+    "_and_": lambda *a: reduce(lambda x, y: np.where(x, y, x), a),
+    "_or_": lambda *a: reduce(lambda x, y: np.where(x, x, y), a),
+    "_not_": np.logical_not,
+    "_if_": np.where,
+}
+
+
+class _ElementWise(ast.NodeTransformer):
+    """rewrite operators working on truth values to functions of _elementWise"""
+
+    @staticmethod
+    def _call(name, args, node):
+        return ast.copy_location(ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[]), node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return self._call("_and_" if isinstance(node.op, ast.And) else "_or_", node.values, node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call("_not_", [node.operand], node)
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self._call("_if_", [node.test, node.body, node.orelse], node)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        # a < b < c -> (a < b) and (b < c)
+        operands = [node.left] + node.comparators
+        pairs = [
+            ast.copy_location(ast.Compare(left=operands[k], ops=[op], comparators=[operands[k + 1]]), node)
+            for k, op in enumerate(node.ops)
+        ]
+        return self._call("_and_", pairs, node)
+
+
+# allowed elements of formula expressions
+_allowedNodes = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.IfExp,
+    ast.Compare,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+)
+
+
+class FormulaEngine(object):
+    """apply formulae to (calibrated) channel values
+
+    formulae are validated and compiled once on creation;
+    calling the object replaces data[..., i] by the result
+    of formula i for all formulae that are not None
+    """
+
+    def __init__(self, Formulae, NHWChannels):
+        """Args:
+        Formulae:     list of formula expressions (or None) as strings
+        NHWChannels:  number of hardware channels c0, c1, ...
+
+        raises ValueError for invalid formulae
+        """
+        self.NHWChannels = NHWChannels
+        self.namespace = _makeNamespace()
+        self.Codes = []  # list of (output index, compiled expression)
+        usedChannels = set()
+        for ifc, f in enumerate(Formulae):
+            if f is None:
+                continue
+            tree, chans = self.validate(str(f), ifc)
+            usedChannels |= chans
+            tree = ast.fix_missing_locations(_ElementWise().visit(tree))
+            self.Codes.append((ifc, compile(tree, "<ChanFormula %i>" % ifc, "eval")))
+        # only copy hardware channels that are referenced in formulae
+        self.usedChannels = sorted(usedChannels)
+        self.NFormulae = len(Formulae)
+
+    def validate(self, formula, ifc):
+        """parse formula and check that only whitelisted names are used
+
+        Returns: parsed expression and set of referenced channel indices
+        """
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError("formula %i '%s': syntax error (%s)" % (ifc, formula, e.msg))
+        chans = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, _allowedNodes):
+                raise ValueError("formula %i '%s': %s not allowed" % (ifc, formula, type(node).__name__))
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError("formula %i '%s': only numerical constants allowed" % (ifc, formula))
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.keywords:
+                    raise ValueError("formula %i '%s': invalid function call" % (ifc, formula))
+            if isinstance(node, ast.Name):
+                name = node.id
+                if name in self.namespace:
+                    continue
+                if name[0] == "c" and name[1:].isdigit() and int(name[1:]) < self.NHWChannels:
+                    chans.add(int(name[1:]))
+                else:
+                    raise ValueError("formula %i '%s': unknown name '%s'" % (ifc, formula, name))
+        return tree, chans
+
+    def __call__(self, data):
+        """apply formulae to data in place
+
+        Args:
+          data: array of shape (NChannels,) or (NSamples, NChannels)
+        Returns: data
+        """
+        # formulae act on original hardware values, so copy them first
+        ns = dict(self.namespace, **_elementWise)
+        for i in self.usedChannels:
+            ns["c" + str(i)] = data[..., i].copy()
+        for ifc, code in self.Codes:
+            data[..., ifc] = eval(code, {"__builtins__": {}}, ns)
+        return data
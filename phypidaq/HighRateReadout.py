@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""high-rate data acquisition in a dedicated thread
+
+Devices are read out in a background thread at fixed intervals
+(well below the 50 ms limit of the standard read-out loop), and
+data are stored in a DataRing. Display, recording and network
+outputs read the ring at their own pace.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import threading
+import time
+
+from .helpers import DAQwait
+
+
+class HighRateReadout(object):
+    """run read-out function periodically and store results in a ring buffer"""
+
+    def __init__(self, acquire, ring, dt, spin=0.0, stats=None):
+        """Args:
+        acquire: function returning a block of samples and their time stamps
+        ring:    instance of DataRing to store data
+        dt:      time between calls of acquire() (in s)
+        spin:    time before deadline spent in busy loop (see helpers.DAQwait)
+        stats:   instance of LatencyStats to record slack of read-out cycles
+        """
+        self.acquire = acquire
+        self.ring = ring
+        self.dt = dt
+        self.spin = spin
+        self.stats = stats
+        self.active = False  # read-out active, False if paused
+        self.running = False  # thread running
+        self.Ncycles = 0  # number of read-out cycles
+        self.Nlag = 0  # number of cycles exceeding dt
+        self.error = None  # exception raised by acquire(), ends read-out
+        self.thread = None
+
+    def start(self):
+        """start read-out thread (in paused mode, use resume() to start acquisition)"""
+        self.running = True
+        self.thread = threading.Thread(name="HighRateReadout", target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def resume(self):
+        self.active = True
+
+    def pause(self):
+        self.active = False
+
+    def stop(self):
+        """end read-out thread"""
+        self.active = False
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=max(1.0, 10 * self.dt))
+
+    def _run(self):
+        wait = None
+        while self.running:
+            if not self.active:
+                wait = None
+                time.sleep(0.01)
+                continue
+            if wait is None:
+                wait = DAQwait(self.dt, self.spin)  # (re-)start timer
+            try:
+                block, tstamps = self.acquire()
+            except Exception as e:
+                self.error = e
+                self.running = False
+                break
+            self.ring.write(block, tstamps)
+            self.Ncycles += 1
+            wait()
+            if self.stats is not None:
+                self.stats.slack(wait.slack)
+            if wait.lag:
+                self.Nlag += 1
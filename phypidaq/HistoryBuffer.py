@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""history of the latest samples for display modules
+
+The latest N samples of each channel are kept in a ring of length 2N,
+in which each sample is stored twice (at positions k and k+N). The N
+latest samples, ordered in time, are thus always a contiguous slice of
+the ring and are returned as a view without copying; appending a sample
+costs the same, independent of the length of the history.
+
+MinMaxHistory keeps long histories at full resolution together with
+minimum and maximum of buckets of samples, i.e. a peak-preserving
+representation with about one point per pixel of the plot.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np
+
+
+class HistoryBuffer(object):
+    """latest N samples of NChannels channels, one row per channel"""
+
+    def __init__(self, N, NChannels):
+        """Args:
+        N:         number of samples in history
+        NChannels: number of channels
+        """
+        self.N = N
+        self.NChannels = NChannels
+        self.ring = np.zeros([NChannels, 2 * N])
+        self.n = 0  # number of samples appended
+
+    def append(self, data, n=None):
+        """add one sample or a batch of samples (one per row)
+
+        Args:
+          data: array of shape (NChannels,) or (m, NChannels)
+          n:    number of the latest sample in data, default: previous number + m
+        """
+        data = np.atleast_2d(data)
+        if n is None:
+            n = self.n + len(data)
+        data = data[-self.N :, : self.NChannels]
+        m = len(data)
+        k = np.arange(n - m, n) % self.N
+        self.ring[:, k] = data.T
+        self.ring[:, k + self.N] = data.T
+        self.n = n
+
+    def view(self):
+        """latest N samples, oldest first, as array of shape (NChannels, N) without copying"""
+        k = self.n % self.N
+        return self.ring[:, k : k + self.N]
+
+    def latest(self):
+        """latest sample"""
+        return self.ring[:, (self.n - 1) % self.N]
+
+
+class MinMaxHistory(object):
+    """long history at full resolution with min/max envelope for plotting
+
+    Samples are grouped in buckets of fixed size, such that the history
+    fits into about NPixels buckets; minimum and maximum of each channel
+    are kept for each bucket and updated incrementally as samples arrive.
+    Plotting minimum and maximum of each bucket alternately preserves
+    peaks, with a number of points given by the width of the plot, not
+    by the length of the history.
+    """
+
+    def __init__(self, N, NChannels, NPixels=600):
+        """Args:
+        N:         number of samples in history
+        NChannels: number of channels
+        NPixels:   width of plot in pixels, i.e. number of buckets
+        """
+        self.N = N
+        self.NChannels = NChannels
+        self.full = HistoryBuffer(N, NChannels)  # full resolution
+        self.bucket = max(1, -(-N // NPixels))  # samples per bucket
+        self.NBuckets = -(-N // self.bucket)
+        self.mins = HistoryBuffer(self.NBuckets, NChannels)
+        self.maxs = HistoryBuffer(self.NBuckets, NChannels)
+        # minimum, maximum and number of samples of incomplete bucket
+        self.pmin = np.full(NChannels, np.inf)
+        self.pmax = np.full(NChannels, -np.inf)
+        self.pcount = 0
+
+    @property
+    def n(self):
+        """number of samples appended"""
+        return self.full.n
+
+    def append(self, data, n=None):
+        """add one sample or a batch of samples (one per row), see HistoryBuffer.append()"""
+        self.full.append(data, n)
+        if self.bucket == 1:
+            return
+        data = np.atleast_2d(data)[-self.N :, : self.NChannels]
+        # complete current bucket ...
+        head = data[: self.bucket - self.pcount]
+        if len(head):
+            self.pmin = np.minimum(self.pmin, head.min(axis=0))
+            self.pmax = np.maximum(self.pmax, head.max(axis=0))
+            self.pcount += len(head)
+        if self.pcount < self.bucket:
+            return
+        self.mins.append(self.pmin)
+        self.maxs.append(self.pmax)
+        # ... add complete buckets ...
+        rest = data[len(head) :]
+        nb = len(rest) // self.bucket
+        if nb:
+            blocks = rest[: nb * self.bucket].reshape(nb, self.bucket, self.NChannels)
+            self.mins.append(blocks.min(axis=1))
+            self.maxs.append(blocks.max(axis=1))
+        # ... and start new bucket with remaining samples
+        tail = rest[nb * self.bucket :]
+        self.pcount = len(tail)
+        if self.pcount:
+            self.pmin = tail.min(axis=0)
+            self.pmax = tail.max(axis=0)
+        else:
+            self.pmin = np.full(self.NChannels, np.inf)
+            self.pmax = np.full(self.NChannels, -np.inf)
+
+    def envelope(self):
+        """points to plot the history
+
+        Returns:
+          x: position of points in units of samples before the latest sample (<= 0)
+          y: array of shape (NChannels, len(x)), full resolution if the history
+             is not longer than NPixels, else minimum and maximum of each bucket
+        """
+        if self.bucket == 1:
+            nf = min(self.full.n, self.N)
+            return -np.arange(nf - 1, -1, -1.0), self.full.view()[:, self.N - nf :]
+        nb = min(self.mins.n, self.NBuckets - 1 if self.pcount else self.NBuckets)
+        mins = self.mins.view()[:, self.NBuckets - nb :]
+        maxs = self.maxs.view()[:, self.NBuckets - nb :]
+        # centres of buckets, oldest first, followed by incomplete bucket
+        x = -(self.pcount + self.bucket * np.arange(nb - 1, -1, -1.0) + (self.bucket - 1) / 2.0)
+        if self.pcount:
+            x = np.append(x, -(self.pcount - 1) / 2.0)
+            mins = np.concatenate((mins, self.pmin[:, None]), axis=1)
+            maxs = np.concatenate((maxs, self.pmax[:, None]), axis=1)
+        y = np.empty((self.NChannels, 2 * len(x)))
+        y[:, 0::2] = mins
+        y[:, 1::2] = maxs
+        return np.repeat(x, 2), y
+
+    def latest(self, m=None):
+        """latest m samples (all if None) at full resolution, oldest first, shape (NChannels, m)"""
+        nf = min(self.full.n, self.N)
+        if m is not None:
+            nf = min(nf, m)
+        return self.full.view()[:, self.N - nf :]
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""timing of the stages of the data acquisition loop
+
+Execution times of each stage (device read-out, calibration, formulae,
+display, buffer, recorder, fifo, websocket) and the slack of each
+read-out cycle before its deadline are collected in histograms with
+logarithmic bins from 1 µs to 10 s. Collecting a value costs about
+one microsecond, so timing is always active. Stages may be timed in
+several threads (read-out, outputs) while statistics are reported.
+
+Usage:
+
+  t = time.perf_counter()
+  <stage 1>
+  t = stats.mark("stage 1", t)
+  <stage 2>
+  t = stats.mark("stage 2", t)
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import threading
+import time
+from bisect import bisect_right
+
+
+class LatencyStats(object):
+    """histograms of execution times of named stages"""
+
+    def __init__(self, binsPerDecade=10, tmin=1e-6, tmax=10.0):
+        """Args:
+        binsPerDecade: number of logarithmic bins per factor of 10
+        tmin, tmax:    range of histograms in s
+        """
+        n = 1
+        self.edges = [tmin]
+        while self.edges[-1] < tmax:
+            self.edges.append(tmin * 10.0 ** (n / binsPerDecade))
+            n += 1
+        self.NBins = len(self.edges) + 1  # incl. under- and overflow
+        self.stages = []  # names of stages in order of appearance
+        self.counts = {}
+        self.n = {}
+        self.sum = {}
+        self.max = {}
+        self.lock = threading.RLock()  # stages are timed in several threads
+        self.T0 = time.time()
+
+    def add(self, stage, dt):
+        """add time dt (in s) for stage"""
+        with self.lock:
+            if stage not in self.counts:
+                self.stages.append(stage)
+                self.counts[stage] = [0] * self.NBins
+                self.n[stage] = 0
+                self.sum[stage] = 0.0
+                self.max[stage] = 0.0
+            self.counts[stage][bisect_right(self.edges, dt)] += 1
+            self.n[stage] += 1
+            self.sum[stage] += dt
+            if dt > self.max[stage]:
+                self.max[stage] = dt
+
+    def mark(self, stage, t):
+        """add time since t for stage and return current time"""
+        now = time.perf_counter()
+        self.add(stage, now - t)
+        return now
+
+    def slack(self, dtcor):
+        """record remaining time before deadline (or lateness if negative)"""
+        if dtcor >= 0.0:
+            self.add("slack", dtcor)
+        else:
+            self.add("late", -dtcor)
+
+    def percentile(self, stage, q):
+        """upper edge of bin containing fraction q of entries (at most the maximum)"""
+        with self.lock:
+            nq = q * self.n[stage]
+            cum = 0
+            for i, c in enumerate(self.counts[stage]):
+                cum += c
+                if cum >= nq and c:
+                    break
+            if i < len(self.edges):
+                return min(self.edges[i], self.max[stage])
+            return self.max[stage]
+
+    def summary(self):
+        """one line with mean and 95% quantile per stage (in ms)"""
+        items = []
+        with self.lock:
+            for s in self.stages:
+                if s == "late":
+                    items.append("late: {0}".format(self.n[s]))
+                else:
+                    mean = 1000.0 * self.sum[s] / self.n[s]
+                    items.append("{0}: {1:.3g}/{2:.3g}".format(s, mean, 1000.0 * self.percentile(s, 0.95)))
+        return "t(ms) mean/95% " + " | ".join(items)
+
+    def table(self):
+        """detailed statistics of all stages as multi-line string"""
+        lines = [
+            "# PhyPiDAQ stage timing, {0:.0f} s since start, times in ms".format(time.time() - self.T0),
+            "# {0:<12} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9} {6:>9}".format(
+                "stage", "n", "mean", "50%", "95%", "99%", "max"
+            ),
+        ]
+        with self.lock:
+            for s in self.stages:
+                lines.append(
+                    "  {0:<12} {1:>9d} {2:>9.3g} {3:>9.3g} {4:>9.3g} {5:>9.3g} {6:>9.3g}".format(
+                        s,
+                        self.n[s],
+                        1000.0 * self.sum[s] / self.n[s],
+                        1000.0 * self.percentile(s, 0.5),
+                        1000.0 * self.percentile(s, 0.95),
+                        1000.0 * self.percentile(s, 0.99),
+                        1000.0 * self.max[s],
+                    )
+                )
+        return "\n".join(lines)
+
+    def write(self, fname):
+        """write statistics table and histograms to file"""
+        with open(fname, "w") as f, self.lock:
+            print(self.table(), file=f)
+            print("# histograms: upper bin edges (ms) and counts per stage", file=f)
+            print("edges," + ",".join("{0:.4g}".format(1000.0 * e) for e in self.edges) + ",inf", file=f)
+            for s in self.stages:
+                print(s + "," + ",".join(str(c) for c in self.counts[s]), file=f)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""publish/subscribe bus for the output of blocks of samples
+
+Each block of samples is published once, as an immutable copy together
+with its time stamps and the number of its first sample (sequence
+number). Output sinks (display, buffer, recorder, fifo, websocket and
+user plugins) subscribe with a function called for each block; every
+sink runs in its own thread and receives the same block object, so a
+slow sink does not delay the data acquisition or the other sinks.
+
+Each subscriber has a list of pending blocks. If maxlen blocks are
+pending, publish() waits for a lossless subscriber (e.g. the recorder),
+while the oldest block is dropped for a lossy one (e.g. the display).
+Pending blocks with consecutive sample numbers are merged and passed
+to the subscriber as one block.
+
+The bus passes numpy arrays. Text outputs (recorder, fifo and websocket
+in csv format) call Block.csv() for the channel values in csv format:
+the text is formatted by the first output asking for it and then shared
+by all others, which only add e.g. time and sample number. Without text
+outputs, no text is formatted at all.
+
+publish() copies the data, unless the caller passes copy=False for an
+array it does not modify afterwards.
+
+Usage:
+
+  bus = OutputBus()
+  bus.subscribe("recorder", lambda b: recorder(b.data, b.tstamps))
+  bus.publish(data, seq, tstamps)
+  ...
+  bus.close()  # deliver pending blocks and stop threads
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import collections
+import threading
+import time
+import numpy as np
+
+from .helpers import formatValues
+
+_csvLock = threading.Lock()  # protects formatting of Block.csv()
+
+
+class Block(collections.namedtuple("Block", ["data", "tstamps", "seq"])):
+    """published block: data of shape (n, NChannels), n time stamps, number of first sample"""
+
+    def csv(self):
+        """channel values as csv text, one line per sample; formatted on first call only"""
+        parts = self.__dict__.get("parts")
+        if parts is not None:  # merged block, join text of published blocks
+            return "".join(b.csv() for b in parts)
+        with _csvLock:
+            if "text" not in self.__dict__:
+                self.text = formatValues(self.data)
+            return self.text
+
+
+def _merge(blocks):
+    """merge blocks with consecutive sample numbers into one block"""
+    merged = Block(np.concatenate([b.data for b in blocks]), np.concatenate([b.tstamps for b in blocks]), blocks[0].seq)
+    merged.parts = blocks
+    return merged
+
+
+def mergeBlocks(blocks):
+    """merge list of blocks with consecutive sample numbers, return list of blocks"""
+    merged = []
+    run = blocks[:1]
+    for b in blocks[1:]:
+        if b.seq == run[-1].seq + len(run[-1].data) and b.data.shape[1:] == run[-1].data.shape[1:]:
+            run.append(b)
+        else:
+            merged.append(run)
+            run = [b]
+    merged.append(run)
+    return [r[0] if len(r) == 1 else _merge(r) for r in merged]
+
+
+class Subscriber(object):
+    """output sink of OutputBus, called in its own thread"""
+
+    def __init__(self, bus, name, callback, lossless, stats):
+        self.bus = bus
+        self.name = name
+        self.callback = callback
+        self.lossless = lossless
+        self.stats = stats
+        self.pending = collections.deque()
+        self.busy = False  # processing blocks taken from pending
+        self.waiting = False  # waiting for blocks to be published
+        self.Nlost = 0  # samples dropped (lossy subscribers only)
+        self.thread = threading.Thread(target=self._run, name="OutputBus-" + name)
+        self.thread.daemon = True
+
+    def _run(self):
+        cond = self.bus.cond
+        while True:
+            with cond:
+                while not self.pending and not self.bus.closed:
+                    self.waiting = True
+                    cond.wait()
+                    self.waiting = False
+                if not self.pending:  # closed and all blocks delivered
+                    return
+                blocks = list(self.pending)
+                self.pending.clear()
+                self.busy = True
+                cond.notify_all()  # publisher may wait for space
+            try:
+                for b in mergeBlocks(blocks):
+                    t = time.perf_counter()
+                    self.callback(b)
+                    if self.stats is not None:
+                        self.stats.mark(self.name, t)
+            except Exception as e:
+                print("!!! OutputBus: output to", self.name, "failed, switched off:", e)
+                self.bus.unsubscribe(self)
+                return
+            finally:
+                with cond:
+                    self.busy = False
+                    cond.notify_all()
+            # collect blocks for a while instead of waking up for each block at high rates
+            if self.bus.coalesce and not self.bus.closed:
+                time.sleep(self.bus.coalesce)
+
+
+class OutputBus(object):
+    """deliver published blocks of samples to subscribers running in threads"""
+
+    def __init__(self, maxlen=1000, stats=None, coalesce=0.001):
+        """Args:
+        maxlen:   maximum number of blocks pending per subscriber
+        stats:    LatencyStats instance to record execution time per subscriber
+        coalesce: time (s) a subscriber collects blocks after processing a batch
+        """
+        self.maxlen = maxlen
+        self.coalesce = coalesce
+        self.stats = stats
+        self.subscribers = []
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def subscribe(self, name, callback, lossless=True):
+        """call callback(block) for each published block in new thread
+
+        Args:
+          name:     name of subscriber, used as stage name in stats
+          callback: function of one argument, a Block
+          lossless: publisher waits if subscriber lags, else oldest blocks are dropped
+
+        Returns: Subscriber
+        """
+        s = Subscriber(self, name, callback, lossless, self.stats)
+        with self.cond:
+            self.subscribers.append(s)
+        s.thread.start()
+        return s
+
+    def unsubscribe(self, s):
+        with self.cond:
+            if s in self.subscribers:
+                self.subscribers.remove(s)
+            s.pending.clear()
+            self.cond.notify_all()
+
+    def publish(self, data, seq, tstamps=None, copy=True):
+        """publish block of samples (one per row) with number seq of first sample
+
+        Args:
+          copy: copy data, needed if the caller reuses its buffer
+
+        Returns: published Block
+        """
+        data = np.array(data, ndmin=2, copy=copy or None)
+        data.flags.writeable = False
+        if tstamps is None:
+            tstamps = np.full(len(data), time.time())
+        else:
+            tstamps = np.array(tstamps, dtype=np.float64, ndmin=1, copy=copy or None)
+        tstamps.flags.writeable = False
+        block = Block(data, tstamps, seq)
+        with self.cond:
+            while any(s.lossless and len(s.pending) >= self.maxlen for s in self.subscribers):
+                self.cond.wait(0.1)  # with timeout, so that <ctrl-C> is handled
+            wake = False
+            for s in self.subscribers:
+                if len(s.pending) >= self.maxlen:  # lossy subscriber lags
+                    s.Nlost += len(s.pending.popleft().data)
+                s.pending.append(block)
+                wake = wake or s.waiting
+            if wake:
+                self.cond.notify_all()
+        return block
+
+    def drain(self):
+        """wait until all published blocks are delivered"""
+        with self.cond:
+            while any(s.pending or s.busy for s in self.subscribers):
+                self.cond.wait()
+
+    def close(self, timeout=None):
+        """deliver pending blocks, then stop subscriber threads
+
+        Args:
+          timeout: maximum time (s) to wait for all subscribers, no limit if None
+
+        Returns: list of subscribers still busy after timeout
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for s in list(self.subscribers):
+            s.thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return [s for s in self.subscribers if s.thread.is_alive()]
@@ -66,5 +66,31 @@ class PSConfig(object):
             else:
                 sig[i] = b.sum() / self.NSamples  # average
 
+    def acquireBlock(self, sig, n):
+        """read one waveform from PicoScope and split it into n samples
+
+        each sample is the average (or rms) of one of n consecutive
+        segments of the waveform
+
+        Args:
+          sig: array of shape (>=n, >=NChannels), one sample per row
+          n:   number of samples
+
+        Returns: array of n time stamps (centres of segments)
+        """
+        ttrg, tlife = self.PS.acquireData(self.buf)  # read data from PicoScope
+        nseg = self.NSamples // n  # samples per segment
+        if nseg < 1:
+            raise ValueError("PSConfig: block size exceeds number of samples per waveform")
+        segs = self.buf[:, : n * nseg].reshape(self.NChannels, n, nseg)
+        for i in range(self.NChannels):
+            if self.AvModes[i]:
+                sig[:n, i] = np.sqrt(np.einsum('ij,ij->i', segs[i], segs[i]) / nseg)  # eff. Voltage
+            else:
+                sig[:n, i] = segs[i].mean(axis=1)  # average
+        # device is ready at the end of the waveform
+        dt = self.PS.TSampling
+        return ttrg - (self.NSamples - (np.arange(n) + 0.5) * nseg) * dt
+
     def closeDevice(self):
         self.PS.closeDevice()
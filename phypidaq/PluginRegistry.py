@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""registry of device, display and output modules
+
+Names used in configuration files (DAQModule in device configurations,
+DisplayModule and OutputSinks in PhyPiDAQ configurations) are mapped to
+classes, which are imported only when needed; thus, only the hardware
+libraries of the devices actually used are loaded.
+
+Names are looked up in
+  - a static table of the modules contained in phypidaq,
+  - entry points of installed packages in groups "phypidaq.devices",
+    "phypidaq.displays" and "phypidaq.sinks", e.g. in pyproject.toml of
+    a third-party driver:
+
+      [project.entry-points."phypidaq.devices"]
+      MyADC = "mypackage.MyADCConfig:MyADCConfig"
+
+  - explicit references "package.module:Class" given as name.
+
+Unknown names are tried as a module of phypidaq containing a class of the
+same name, as done by earlier versions of PhyPiDAQ.
+
+Usage:
+
+  from .PluginRegistry import devices
+  DEV = devices.get("ToyDataConfig")(confdict)
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import importlib
+import importlib.util
+
+
+class PluginRegistry(object):
+    """map names to lazily imported classes"""
+
+    def __init__(self, kind, group, table):
+        """Args:
+        kind:  kind of plugin, used in error messages
+        group: name of entry-point group for plugins of installed packages
+        table: dictionary {name: "module:Class"} of built-in plugins
+        """
+        self.kind = kind
+        self.group = group
+        self.table = dict(table)
+        self.classes = {}  # cache of imported classes
+        self.entry_points = None  # read on first use
+
+    def register(self, name, target):
+        """add plugin name, target is a class or a reference "module:Class" """
+        if isinstance(target, str):
+            self.table[name] = target
+            self.classes.pop(name, None)
+        else:
+            self.classes[name] = target
+
+    def _entryPoints(self):
+        if self.entry_points is None:
+            try:
+                from importlib.metadata import entry_points
+
+                eps = entry_points()
+                if hasattr(eps, "select"):  # python >= 3.10
+                    eps = eps.select(group=self.group)
+                else:
+                    eps = eps.get(self.group, [])
+                self.entry_points = {ep.name: ep for ep in eps}
+            except ImportError:
+                self.entry_points = {}
+        return self.entry_points
+
+    def names(self):
+        """names of all known plugins"""
+        names = set(self.table) | set(self.classes) | set(self._entryPoints())
+        return sorted(n for n in names if ":" not in n)
+
+    @staticmethod
+    def _import(ref):
+        """import class from reference "module:Class", modules without package are taken from phypidaq"""
+        module, cls = ref.split(":")
+        if "." not in module:
+            module = "phypidaq." + module
+        return getattr(importlib.import_module(module), cls)
+
+    def get(self, name):
+        """return class of plugin name, importing its module if needed"""
+        if name in self.classes:
+            return self.classes[name]
+        if name in self.table:
+            cls = self._import(self.table[name])
+        elif name in self._entryPoints():
+            cls = self._entryPoints()[name].load()
+        elif ":" in name:
+            cls = self._import(name)
+        elif importlib.util.find_spec("phypidaq." + name) is not None:
+            # module in phypidaq with class of the same name
+            cls = self._import(name + ":" + name)
+        else:
+            raise ImportError(
+                "unknown {0} module '{1}', known modules: {2}".format(self.kind, name, ", ".join(self.names()))
+            )
+        self.classes[name] = cls
+        return cls
+
+
+devices = PluginRegistry(
+    "device",
+    "phypidaq.devices",
+    {
+        "ADS1115Config": "ADS1115Config:ADS1115Config",
+        "ADXL345Config": "ADXL345Config:ADXL345Config",
+        "AS7262Config": "AS7262Config:AS7262Config",
+        "AS7265xConfig": "AS7265xConfig:AS7265xConfig",
+        "BME280Config": "BME280Config:BME280Config",
+        "BME680Config": "BME680Config:BME680Config",
+        "BMP280Config": "BMP280Config:BMP280Config",
+        "BMP388Config": "BMP388Config:BMP388Config",
+        "BMPx80Config": "BMPx80Config:BMPx80Config",
+        "DS18B20Config": "DS18B20Config:DS18B20Config",
+        "GDK101Config": "GDK101Config:GDK101Config",
+        "GPIOCount": "GPIOCount:GPIOCount",
+        "groveADCConfig": "groveADCConfig:GroveADCConfig",
+        "GroveADCConfig": "groveADCConfig:GroveADCConfig",
+        "HX711Config": "HX711Config:HX711Config",
+        "INA219Config": "INA219Config:INA219Config",
+        "MAX31855Config": "MAX31855Config:MAX31855Config",
+        "MAX31865Config": "MAX31865Config:MAX31865Config",
+        "MCP3x08Config": "MCP3x08Config:MCP3x08Config",
+        "MCP3008Config": "MCP3x08Config:MCP3x08Config",
+        "MCP3208Config": "MCP3x08Config:MCP3x08Config",
+        "MLX90393Config": "MLX90393Config:MLX90393Config",
+        "MMA8451Config": "MMA8451Config:MMA8451Config",
+        "MMA845xConfig": "MMA845xConfig:MMA845xConfig",
+        "PL1000Config": "PL1000Config:PL1000Config",
+        "PSConfig": "PSConfig:PSConfig",
+        "RC1xxConfig": "RC1xxConfig:RC1xxConfig",
+        "ReplayConfig": "ReplayConfig:ReplayConfig",
+        "soundcardOsci": "soundcardOsci:SoundCardOsci",
+        "SoundCardOsci": "soundcardOsci:SoundCardOsci",
+        "TCS34725Config": "TCS34725Config:TCS34725Config",
+        "TSL45315Config": "TSL45315Config:TSL45315Config",
+        "ToyDataConfig": "ToyDataConfig:ToyDataConfig",
+        "VL53LxConfig": "VL53LxConfig:VL53LxConfig",
+    },
+)
+
+displays = PluginRegistry(
+    "display",
+    "phypidaq.displays",
+    {
+        "DataLogger": "DataLogger:DataLogger",
+        "DataGraphs": "DataGraphs:DataGraphs",
+        "DataSpectrum": "DataSpectrum:DataSpectrum",
+    },
+)
+
+# output plugins: class(PhyPiConfDict), instances called with each block of
+#   samples (see OutputBus.Block) in their own thread, close() at end of run
+sinks = PluginRegistry("output", "phypidaq.sinks", {})
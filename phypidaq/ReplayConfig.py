@@ -4,11 +4,26 @@ from __future__ import absolute_import
 
 import numpy as np
 import os
+import time
 import pkgutil
+import io
+from itertools import islice
+
+from .BinaryData import BinaryReader, splitTag
 
 
 class ReplayConfig(object):
-    """replay data from file"""
+    """replay data from file
+
+    csv files are read in chunks of ChunkSize lines, binary files (.pdaq)
+    are mapped to memory, so that only a window of the data is held in
+    memory; at the end of the file, replay starts again from the beginning.
+
+    Option Speed sets the replay speed relative to the time axis of the
+    recording: 1 for original speed, N for N times faster, 0 (default)
+    for no pacing, i.e. samples are delivered as fast as they are read
+    out (e.g. in blocks, option BlockSize, for off-line processing).
+    """
 
     def __init__(self, confdict=None):
         if confdict is None:
@@ -19,7 +34,7 @@ class ReplayConfig(object):
         else:
             self.csvFile = None
 
-        if "csvSepatator" in confdict:
+        if "csvSeparator" in confdict:
             self.csvSeparator = confdict["csvSeparator"]
         else:
             self.csvSeparator = ','  # field separator used in csv file
@@ -30,46 +45,140 @@ class ReplayConfig(object):
         else:
             self.NChannels = None
 
+        if "Speed" in confdict:
+            self.speed = confdict["Speed"]
+        else:
+            self.speed = 0  # no pacing
+
+        if "ChunkSize" in confdict:
+            self.chunkSize = confdict["ChunkSize"]
+        else:
+            self.chunkSize = 10000  # lines of csv file read at once
+
     def init(self):
         # open data file
-        if self.csvFile is None:
-            d = pkgutil.get_data('phypidaq', 'PhyPiDemoData.csv').decode('utf-8')
+        self.binary = self.csvFile is not None and self.csvFile.endswith('.pdaq')
+        if self.binary:
+            # binary file, mapped to memory
+            self.reader = BinaryReader(os.path.expanduser(self.csvFile))
+            if len(self.reader) == 0:
+                raise ValueError("ReplayConfig: no data in file " + self.csvFile)
+            self.dT = self.reader.Interval
+            tags = self.reader.ChanTags
+            if self.NChannels is None:
+                self.NChannels = self.reader.NChannels
+            self.Ndat = len(self.reader)
+            # duration of one pass through file
+            self.tfirst = self.reader.tstamps[0]
+            self.duration = self.reader.tstamps[-1] - self.tfirst + self.dT
+            window = self.reader.data[: self.chunkSize]
         else:
-            f = open(os.path.expanduser(self.csvFile), 'r')
-            d = f.read()
-            f.close()
-        rdata = d.splitlines()
-        # read header
-        # h0 = rdata[0][1:]  # remove leading '#'
-        # h1 = rdata[1][1:]
-        tags = rdata[2][1:].split(self.csvSeparator)
-        if self.NChannels is None:
-            self.NChannels = len(tags)
-
-        self.data = np.loadtxt(
-            rdata, dtype=np.float32, delimiter=self.csvSeparator, unpack=True
-        )  # read data part of file
-        self.Ndat = len(self.data[0])  # number of data points in file
-
-        # provide configuration parameters
+            if self.csvFile is None:
+                d = pkgutil.get_data('phypidaq', 'PhyPiDemoData.csv').decode('utf-8')
+                self.f = io.StringIO(d)
+            else:
+                self.f = open(os.path.expanduser(self.csvFile), 'r')
+            # read header
+            self.f.readline()  # title line
+            h1 = self.f.readline()
+            h2 = self.f.readline()
+            self.dataStart = self.f.tell()
+            try:  # logging interval, needed for time stamps
+                self.dT = float(h1.split()[-1])
+            except (IndexError, ValueError):
+                self.dT = 1.0
+            tags = h2.strip()[1:].strip().split(self.csvSeparator)
+            if self.NChannels is None:
+                self.NChannels = len(tags)
+            self.chunk = self.readChunk()  # window of data
+            if len(self.chunk) == 0:
+                raise ValueError("ReplayConfig: no data in file " + str(self.csvFile))
+            self.ichunk = 0  # index of next sample in window
+            self.wholeFile = len(self.chunk) < self.chunkSize  # file fits into window
+            window = self.chunk
+
+        # provide configuration parameters, limits from first window of data
         self.ChanLims = [[0.0, 1.0], [0.0, 1.0]] * self.NChannels
         for i in range(self.NChannels):
-            mn = min(self.data[i]).tolist()  # .tolist() needed to
-            mx = max(self.data[i]).tolist()  # store as python floats
+            mn = window[:, i].min().tolist()  # .tolist() needed to
+            mx = window[:, i].max().tolist()  # store as python floats
             d = (mx - mn) * 0.05
             self.ChanLims[i] = [mn - d, mx + d]
-        self.ChanNams = [tags[i].split(':')[0] for i in range(self.NChannels)]
+        self.ChanNams = [splitTag(tags[i])[0] for i in range(self.NChannels)]
+        self.ChanUnits = [splitTag(tags[i])[2] for i in range(self.NChannels)]
 
-        self.idx = 0  # initialize index to data
+        self.idx = 0  # index of next sample in binary file
+        self.Npass = 0  # number of complete passes through file
+        self.Nread = 0  # number of samples read
+        self.T0 = None  # time of first read-out
+
+    def readChunk(self):
+        """read next chunkSize lines of csv file"""
+        lines = list(islice(self.f, self.chunkSize))
+        if not lines:
+            return np.zeros((0, self.NChannels), dtype=np.float32)
+        return np.loadtxt(lines, dtype=np.float32, delimiter=self.csvSeparator, ndmin=2)
+
+    def nextSamples(self, buf, n):
+        """copy next n samples to rows of buf
+
+        Returns: time of samples relative to start of replay
+        """
+        if self.binary:
+            trel = np.empty(n)
+            i = 0
+            while i < n:
+                m = min(n - i, self.Ndat - self.idx)
+                buf[i : i + m, : self.NChannels] = self.reader.data[self.idx : self.idx + m, : self.NChannels]
+                trel[i : i + m] = (
+                    self.reader.tstamps[self.idx : self.idx + m] - self.tfirst + self.Npass * self.duration
+                )
+                i += m
+                self.idx += m
+                if self.idx == self.Ndat:  # start again at beginning of file
+                    self.idx = 0
+                    self.Npass += 1
+        else:
+            i = 0
+            while i < n:
+                if self.ichunk == len(self.chunk) and self.wholeFile:  # start again with same window
+                    self.ichunk = 0
+                    self.Npass += 1
+                elif self.ichunk == len(self.chunk):  # read next window
+                    self.chunk = self.readChunk()
+                    self.ichunk = 0
+                    if len(self.chunk) == 0:  # start again at beginning of file
+                        self.f.seek(self.dataStart)
+                        self.Npass += 1
+                        continue
+                m = min(n - i, len(self.chunk) - self.ichunk)
+                buf[i : i + m, : self.NChannels] = self.chunk[self.ichunk : self.ichunk + m, : self.NChannels]
+                i += m
+                self.ichunk += m
+            trel = (self.Nread + np.arange(n)) * self.dT
+        self.Nread += n
+        return trel
 
     def acquireData(self, buf):
-        """return data"""
-        for i in range(self.NChannels):
-            buf[i] = self.data[i][self.idx]
-            self.idx += 1
-            if self.idx == self.Ndat:
-                self.idx = 0
+        """return data of next sample"""
+        self.acquireBlock(buf[np.newaxis], 1)
+
+    def acquireBlock(self, buf, n):
+        """return next n samples, one sample per row of buf
+
+        Returns: array of n time stamps, from time axis of file
+        """
+        if self.T0 is None:
+            self.T0 = time.time()  # time stamp of first sample
+        trel = self.nextSamples(buf, n)
+        if self.speed > 0:
+            # wait until last sample of block is due
+            trel = trel / self.speed
+            dt = self.T0 + trel[-1] - time.time()
+            if dt > 0:
+                time.sleep(dt)
+        return self.T0 + trel
 
     def closeDevice(self):
-        # nothing to do here
-        pass
+        if not self.binary:
+            self.f.close()
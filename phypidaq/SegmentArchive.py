@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""archive of closed segments of long-term recordings
+
+Segments (files) closed by DataRecorder are compressed in a background
+thread, so that recording is not delayed, and entered in an index file
+listing, for each segment, the file name, time stamps of the first and
+last sample and the number of samples:
+
+  # PhyPiDAQ recording index 261018-1200
+  # segment,first time stamp,last time stamp,samples
+  rec_261018-1200_0000.csv.gz,1792315200.000,1792318799.900,36000
+
+The segments containing a given time window are found with
+findSegments() without reading the segments themselves.
+
+Compression methods: gzip, xz and zstd (needs package zstandard).
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import os
+import shutil
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+COMPRESSIONS = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}
+
+
+def compressFile(fname, method):
+    """compress file fname with method gzip, xz or zstd, remove original
+
+    Returns: name of compressed file
+    """
+    cname = fname + COMPRESSIONS[method]
+    with open(fname, "rb") as fin:
+        if method == "gzip":
+            import gzip
+
+            with gzip.open(cname, "wb", compresslevel=6) as fout:
+                shutil.copyfileobj(fin, fout, 1 << 20)
+        elif method == "xz":
+            import lzma
+
+            with lzma.open(cname, "wb") as fout:
+                shutil.copyfileobj(fin, fout, 1 << 20)
+        else:
+            import zstandard
+
+            with open(cname, "wb") as fout:
+                zstandard.ZstdCompressor().copy_stream(fin, fout)
+    os.remove(fname)
+    return cname
+
+
+class SegmentArchive(object):
+    """compress closed segments in background and keep index of segments"""
+
+    def __init__(self, indexFile, compression=None):
+        """Args:
+        indexFile:   name of index file
+        compression: gzip, xz, zstd or None
+        """
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError("unknown compression '{0}', use one of {1}".format(compression, ", ".join(COMPRESSIONS)))
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                print("!!! SegmentArchive: package zstandard not installed - using gzip")
+                compression = "gzip"
+        self.compression = compression
+        self.indexFile = indexFile
+        with open(indexFile, "w") as f:
+            print("# PhyPiDAQ recording index", time.strftime("%y%m%d-%H%M", time.localtime()), file=f)
+            print("# segment,first time stamp,last time stamp,samples", file=f)
+
+        self.todo = queue.Queue()
+        self.thread = threading.Thread(target=self._worker, name="SegmentArchive")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, fname, tfirst, tlast, nsamples):
+        """archive closed segment fname with time stamps of first and last sample"""
+        self.todo.put((fname, tfirst, tlast, nsamples))
+
+    def _worker(self):
+        while True:
+            item = self.todo.get()
+            if item is None:
+                break
+            fname, tfirst, tlast, nsamples = item
+            if self.compression is not None:
+                try:
+                    fname = compressFile(fname, self.compression)
+                except Exception as e:  # keep uncompressed segment
+                    print("!!! SegmentArchive: compression of", fname, "failed:", e)
+            with open(self.indexFile, "a") as f:
+                print(
+                    "{0},{1:.3f},{2:.3f},{3:d}".format(os.path.basename(fname), tfirst, tlast, nsamples),
+                    file=f,
+                )
+
+    def close(self):
+        """wait until all segments are archived"""
+        if self.thread is not None:
+            self.todo.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+def findSegments(indexFile, tmin=None, tmax=None):
+    """segments of a recording containing samples with time stamps in [tmin, tmax]
+
+    Returns: list of (file name, first time stamp, last time stamp, samples)
+    """
+    segments = []
+    path = os.path.dirname(indexFile)
+    with open(indexFile, "r") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            name, t0, t1, n = line.strip().rsplit(",", 3)
+            t0, t1 = float(t0), float(t1)
+            if (tmin is None or t1 >= tmin) and (tmax is None or t0 <= tmax):
+                segments.append((os.path.join(path, name), t0, t1, int(n)))
+    return segments
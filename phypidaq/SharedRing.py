@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""ring buffer for samples with time stamps in shared memory
+
+same interface as DataRing, but data are kept in a block of
+shared memory (multiprocessing.shared_memory), so that a process
+(e.g. the display) can read samples written by another process
+(e.g. the data acquisition) without pickling and without blocking
+the writer.
+
+There must be only one writer. Two counters in the header of the
+shared memory block indicate the number of samples written and the
+number of samples being written; readers use them to discard samples
+overwritten while being copied, so data are copied without holding a
+lock. The counters themselves are only accessed while holding a
+multiprocessing lock: its acquire and release order the accesses to
+shared memory between processes, also on CPUs with weak memory
+ordering (ARM of the Raspberry Pi), where plain stores may become
+visible to another process in a different order.
+
+The lock is created with the ring and passed on to processes started
+with the ring as argument; an instance attached to the memory by name
+needs the lock of the creator, see argument lock.
+"""
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import os
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedRing(object):
+    """ring buffer of N samples with NChannels channels and time stamps in shared memory"""
+
+    def __init__(self, N, NChannels, name=None, lock=None):
+        """Args:
+        N:         number of samples kept in buffer
+        NChannels: number of channels per sample
+        name:      name of existing shared memory block to attach to,
+                   a new block is created if None
+        lock:      lock of the creator of the block (attribute lock), a new lock if None
+        """
+        self.N = N
+        self.NChannels = NChannels
+        self.owner = name is None  # creator of shared memory removes it ...
+        self.pid = os.getpid()  # ... but not in a forked child process
+        if self.owner:
+            size = 8 * (2 + N * NChannels + N)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.lock = mp.Lock() if lock is None else lock  # protects header
+
+        buf = self.shm.buf
+        # header: number of samples written, number of samples being written
+        self.header = np.ndarray(2, dtype=np.int64, buffer=buf, offset=0)
+        self.data = np.ndarray((N, NChannels), dtype=np.float64, buffer=buf, offset=16)
+        self.tstamps = np.ndarray(N, dtype=np.float64, buffer=buf, offset=16 + 8 * N * NChannels)
+        if self.owner:
+            self.header[:] = 0
+
+    # pickled instances (passed to a new process) attach to the same memory and lock
+    def __getstate__(self):
+        return {"N": self.N, "NChannels": self.NChannels, "name": self.name, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.__init__(state["N"], state["NChannels"], state["name"], state["lock"])
+
+    def _counters(self):
+        """number of samples written and number of samples being written"""
+        with self.lock:
+            return int(self.header[0]), int(self.header[1])
+
+    @property
+    def seq(self):
+        """sequence number of next sample = number of samples written"""
+        return self._counters()[0]
+
+    def write(self, data, tstamps=None):
+        """store one sample or a block of samples
+
+        Args:
+          data:    array of shape (NChannels,) or (n, NChannels)
+          tstamps: time stamp or array of n time stamps, current time if None
+        """
+        data = np.atleast_2d(data)
+        n = len(data)
+        if tstamps is None:
+            tstamps = np.full(n, time.time())
+        else:
+            tstamps = np.atleast_1d(tstamps)
+        seq = int(self.header[0])  # only changed by this writer
+        if n > self.N:  # keep only the latest N samples
+            seq += n - self.N
+            data = data[-self.N :]
+            tstamps = tstamps[-self.N :]
+            n = self.N
+        with self.lock:
+            self.header[1] = seq + n  # announce samples being written
+        k = seq % self.N
+        n1 = min(n, self.N - k)  # samples up to end of buffer ...
+        self.data[k : k + n1] = data[:n1, : self.NChannels]
+        self.tstamps[k : k + n1] = tstamps[:n1]
+        if n1 < n:  # ... and remaining samples at start
+            self.data[: n - n1] = data[n1:, : self.NChannels]
+            self.tstamps[: n - n1] = tstamps[n1:]
+        with self.lock:
+            self.header[0] = seq + n
+
+    def read(self, seq, nmax=None):
+        """return copies of all samples written since sequence number seq
+
+        Args:
+          seq:  sequence number of first sample to read
+          nmax: maximum number of samples to return
+
+        Returns:
+          next sequence number to read,
+          data of shape (n, NChannels), time stamps,
+          number of lost samples (overwritten before being read)
+        """
+        last = self._counters()[0]
+        first = max(seq, last - self.N)
+        if nmax is not None:
+            last = min(last, first + nmax)
+        idx = np.arange(first, last) % self.N
+        data = self.data[idx]
+        tstamps = self.tstamps[idx]
+        # discard samples overwritten by the writer while copying
+        valid = self._counters()[1] - self.N
+        if valid > first:
+            data = data[valid - first :]
+            tstamps = tstamps[valid - first :]
+            first = min(valid, last)
+        return last, data, tstamps, first - seq
+
+    def latest(self):
+        """return latest sample and its time stamp (or None, None if empty)"""
+        seq = self.seq
+        if seq == 0:
+            return None, None
+        seq, data, tstamps, _ = self.read(seq - 1)
+        if not len(data):  # overwritten while being copied
+            return None, None
+        return data[-1], tstamps[-1]
+
+    def close(self):
+        """detach from shared memory, the creator also removes it"""
+        if self.shm is None:
+            return
+        self.header = self.data = self.tstamps = None  # release views of buffer (lock is kept)
+        self.shm.close()
+        if self.owner and os.getpid() == self.pid:
+            self.shm.unlink()
+        self.shm = None
@@ -2,6 +2,7 @@
 from __future__ import print_function, division, unicode_literals
 from __future__ import absolute_import
 
+import time
 import numpy as np
 
 
@@ -29,7 +30,7 @@ class ToyDataConfig(object):
         self.omega = 1.0 / 20.0
 
     def init(self):
-        return
+        self.tlast = time.time()  # time of last block read-out
 
     def acquireData(self, buf):
         """fill random data"""
@@ -39,6 +40,27 @@ class ToyDataConfig(object):
                 np.sin(self.count * self.omega * (i + 1) * np.pi - i * np.pi / 3.0) + self.noise * np.random.rand()
             )
 
+    def acquireBlock(self, buf, n):
+        """fill n samples of random data, spread evenly over the time since the last call
+
+        Args:
+          buf: array of shape (>=n, >=NChannels), one sample per row
+          n:   number of samples
+
+        Returns: array of n time stamps
+        """
+        t = time.time()
+        cnt = self.count + 1.0 + np.arange(n)[:, None]
+        i = np.arange(self.NChannels)
+        buf[:n, : self.NChannels] = (i + 1) * self.offset + self.amplitude * (
+            np.sin(cnt * self.omega * (i + 1) * np.pi - i * np.pi / 3.0)
+            + self.noise * np.random.rand(n, self.NChannels)
+        )
+        self.count += n
+        ts = np.linspace(self.tlast, t, n + 1)[1:]
+        self.tlast = t
+        return ts
+
     def closeDevice(self):
         # nothing to do here
         pass
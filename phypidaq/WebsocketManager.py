@@ -1,29 +1,88 @@
 import multiprocessing as mp
 import asyncio
+import collections
+import json
+import queue
+import signal
+import time
 import websockets
+import numpy as np
+
+from phypidaq.SharedRing import SharedRing
+from phypidaq.BinaryData import packFrame
+from phypidaq.helpers import formatCSV
 
 
 class WebsocketManager(object):
     """starts websockets server as background process;
-    sends data to websocket on localhost:8314
+    sends data to all clients of websocket on port 8314 (default)
+
+    Data are written to a ring buffer in shared memory and never block
+    the data acquisition. The server process collects new samples from
+    the ring until batch_size samples are present or batch_interval has
+    passed, formats them once and hands the message to each client's
+    send queue of limited length (WebsocketQueueSize); each client is
+    served by its own task, so that a slow client only loses its own
+    (oldest) messages and does not delay the others.
+
+    Protocol: the client sends "req_connect" (answer: "ack_connect") and
+    then "getData" for data in csv format, one message per sample with
+    time and values. With "getData csv", lines start with the sample number;
+    with "getData binary", binary frames are sent (see
+    BinaryData.packFrame(), float32 values, time stamps and number of
+    first sample). In both cases, a text message with a description in
+    json format comes first. The end of data is marked by the text
+    message "\n".
+
+    Samples of the last retention seconds (at most 64 MB) are kept in the ring. A client
+    reconnecting after a loss of connection appends "since <n>" to the
+    request to receive all retained samples from sample number n on,
+    in messages as large as possible, before live data; "first" in the
+    description gives the number of the first sample sent from the
+    ring, or null if there is none.
+
+    While clients receive text, the csv text of the channel values is
+    passed on by the publisher (e.g. Block.csv() of the output bus, shared
+    with the other text outputs) and only sample numbers and times are
+    added here; samples without such text are formatted by the server.
 
     sent data can be read with script
     read_Websocket.py ws://localhost:8314
     """
 
-    def __init__(self, interval=0.1, config_dict=None, data_queue=None):
+    def __init__(
+        self,
+        interval=0.1,
+        config_dict=None,
+        data_queue=None,
+        port=8314,
+        queue_size=100,
+        retention=10.0,
+        batch_size=1000,
+        batch_interval=0.05,
+    ):
         self.processes = []
-        self.data_queue = data_queue
+        self.data_queue = data_queue  # not used, data are passed via shared memory
         self.interval = interval
+        self.port = port
+        self.queue_size = queue_size  # messages queued per client
+        self.batch_size = batch_size  # send when batch_size samples are present ...
+        self.batch_interval = batch_interval  # ... or batch_interval (s) has passed
         if config_dict is not None:
             self.config_dict = config_dict
         else:
             self.config_dict = {}
+        self.NChannels = self.config_dict.get("NChannels", 1)
 
-        # Create queue if not set
-        if self.data_queue is None:
-            # Queue for data transfer to sub-process
-            self.data_queue = mp.Queue(1)
+        # ring buffer in shared memory, column 0 holds the sample number;
+        # retention (s) of samples for clients resuming after a disconnect
+        ring_size = max(4096, int(np.ceil(retention / interval))) if interval > 0 else 4096
+        ring_size = min(ring_size, max(4096, 2**23 // (self.NChannels + 2)))  # limit memory to 64 MB
+        self.data_ring = SharedRing(ring_size, self.NChannels + 1)
+        self.finished = mp.Event()
+        # csv text of channel values from the publisher, while clients receive text
+        self.text_wanted = mp.Event()
+        self.text_queue = mp.Queue()
 
         # Create a new process
         self.processes.append(mp.Process(name="WebsocketServer", target=self.spawn_websocket))
@@ -34,43 +93,225 @@ class WebsocketManager(object):
                 prc.start()
                 print('Starting subprocess ', prc.name, ' PID=', prc.pid)
 
-    def __call__(self, dat):
-        self.data_queue.put(dat)
+    def send(self, block, n0, tstamps=None, text=None):
+        """publish block of samples (one per row), n0: number of first sample;
+        never blocks, the server picks up data at its own pace
 
-    def close(self):
-        # Shut-down all sub-process(es)
+        text: function returning the values as csv text (e.g. Block.csv),
+              called only if clients receive text
+        """
+        block = np.atleast_2d(block)
+        if text is not None and self.text_wanted.is_set() and block.shape[1] == self.NChannels:
+            self.text_queue.put((int(n0), text()))  # before data, so that the server finds it
+        rows = np.empty((len(block), self.NChannels + 1))
+        rows[:, 0] = n0 + np.arange(len(block))
+        rows[:, 1:] = block[:, : self.NChannels]
+        self.data_ring.write(rows, tstamps)
+
+    def close(self, timeout=3.0):
+        """send remaining data and empty record to clients, then shut down sub-process(es)"""
+        self.finished.set()
         for p in self.processes:
+            p.join(timeout)
             if p.is_alive():
                 p.terminate()
                 print('Terminating ' + p.name)
+        self.text_queue.cancel_join_thread()  # text not picked up by the server is obsolete
+        self.text_queue.close()
+        if self.data_ring is not None:
+            self.data_ring.close()
+            self.data_ring = None
 
     def spawn_websocket(self):
+        # ignore <ctrl-C>, the server is shut down by close() after sending all data
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        asyncio.run(self.serve())
+
+    async def serve(self):
         host = ''
-        port = 8314
         dbg = False
+        ring = self.data_ring
+        senders = {}  # sender tasks of clients requesting data, by send queue
+        live = set()  # send queues of clients receiving live data
+        texts = collections.deque()  # number of first sample and csv lines of values from publisher
+        seq = 0  # sequence number (in ring) of next sample to publish
+        done = False  # end of data published
+        # check for new data at least every 10 ms
+        poll = min(max(self.batch_interval, 0.001), 0.01)
+        # samples per message, well below client limit of 1 MB
+        nbulk = max(1, 16384 // self.NChannels)
+        nmax = min(self.batch_size, nbulk)
+
+        def put(q, msg):
+            # add message to queue of client, drop oldest message if full
+            if q.full():
+                q.get_nowait()
+                q.Ndropped += 1
+            q.put_nowait(msg)
+
+        def pack(rows, tstamps):
+            # frames of consecutive samples, sample numbers in column 0 of rows
+            nums = rows[:, 0].astype(np.int64)
+            cuts = [0] + list(np.flatnonzero(np.diff(nums) != 1) + 1) + [len(rows)]
+            return b"".join(packFrame(nums[a], tstamps[a:b], rows[a:b, 1:]) for a, b in zip(cuts[:-1], cuts[1:]))
+
+        def values(rows):
+            # csv lines of values of rows from text of publisher, None if not available
+            while True:
+                try:
+                    n0, txt = self.text_queue.get_nowait()
+                except queue.Empty:
+                    break
+                texts.append((n0, txt.splitlines(True)))
+            nums = rows[:, 0].astype(np.int64)
+            while texts and texts[0][0] + len(texts[0][1]) <= nums[0]:
+                texts.popleft()  # samples already sent
+            lines = []
+            for n0, block in texts:
+                k = len(lines)
+                if k == len(nums) or not n0 <= nums[k] < n0 + len(block):
+                    break
+                lines += block[nums[k] - n0 : nums[k] - n0 + len(nums) - k]
+            if len(lines) < len(nums) or nums[-1] - nums[0] != len(nums) - 1:
+                return None
+            return lines
 
-        async def data_provider(websocket, path):
-            async for message in websocket:
-                if dbg:
-                    print("server got: ", message)
+        def encode(fmt, rows, tstamps):
+            if fmt == "binary":
+                return pack(rows, tstamps)
+            msg = formatCSV(rows[:, 1:], rows[:, 0], self.interval, seq=fmt == "csv", values=values(rows))
+            if fmt == "legacy":  # list of lines, sent as one message per sample
+                return msg.splitlines(True)
+            return msg
 
-                if message == "req_connect":
-                    # confirm connection
-                    await websocket.send("ack_connect")
+        async def transmit(websocket, msg):
+            if isinstance(msg, list):
+                for line in msg:
+                    await websocket.send(line)
+            else:
+                await websocket.send(msg)
+
+        def publish(rows, tstamps):
+            # format at most once per format for all clients
+            msgs = {}
+            for q in live:
+                if q.format not in msgs:
+                    msgs[q.format] = encode(q.format, rows, tstamps)
+                put(q, msgs[q.format])
+
+        def find(n):
+            # sequence number of first retained sample with sample number >= n, at most seq
+            lo, hi = min(max(0, ring.seq - ring.N), seq), seq
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if ring.data[mid % ring.N, 0] < n:
+                    lo = mid + 1
                 else:
-                    #  get and send data
+                    hi = mid
+            return lo
+
+        def description(fmt, first):
+            return json.dumps(
+                {
+                    "format": fmt,
+                    "dtype": "float32" if fmt == "binary" else "text",
+                    "NChannels": self.NChannels,
+                    "ChanNams": self.config_dict.get("ChanNams", []),
+                    "ChanUnits": self.config_dict.get("ChanUnits", []),
+                    "Interval": self.interval,
+                    "first": first,
+                }
+            )
+
+        async def sender(websocket, q, cursor):
+            # bulk backfill of retained samples from cursor on, ...
+            while cursor is not None and cursor < seq:
+                cursor, rows, tstamps, lost = ring.read(cursor, min(nbulk, seq - cursor))
+                q.Nlost += lost
+                if len(rows):
+                    await transmit(websocket, encode(q.format, rows, tstamps))
+            # ... then live data (no await between last check and joining)
+            live.add(q)
+            if done:
+                await websocket.send('\n')
+                return
+            while True:
+                msg = await q.get()
+                await transmit(websocket, msg)
+                if msg == '\n':
+                    break
+
+        async def data_provider(websocket, path=None):
+            q = None
+            try:
+                async for message in websocket:
+                    if dbg:
+                        print("server got: ", message)
+
+                    if message == "req_connect":
+                        # confirm connection
+                        await websocket.send("ack_connect")
+                    elif q is None:
+                        # start sending data to this client: getData [csv|binary] [since <n>]
+                        words = message.split()
+                        q = asyncio.Queue(self.queue_size)
+                        q.Ndropped = q.Nlost = 0
+                        q.format = "binary" if "binary" in words else "csv" if len(words) > 1 else "legacy"
+                        cursor = first = None
+                        if "since" in words:
+                            try:
+                                cursor = find(int(words[words.index("since") + 1]))
+                            except (IndexError, ValueError):
+                                pass
+                            if cursor is not None and cursor < seq:
+                                first = int(ring.data[cursor % ring.N, 0])
+                        if q.format != "legacy":
+                            await websocket.send(description(q.format, first))
+                        senders[q] = asyncio.ensure_future(sender(websocket, q, cursor))
+            except websockets.ConnectionClosed:
+                pass
+            finally:
+                if q is not None:
+                    live.discard(q)
+                    senders.pop(q).cancel()
+                    if q.Ndropped or q.Nlost:
+                        print("** websocket client: {0} messages dropped, {1} samples lost".format(q.Ndropped, q.Nlost))
+
+        # start web service
+        print('** server running under uri ws://' + host + ':', self.port)
+        # no per-message compression: it would be repeated for every client
+        async with websockets.serve(data_provider, host, self.port, compression=None, close_timeout=1.0):
+            Nlost = 0
+            tsent = time.monotonic()
+            while True:
+                # ask publisher for csv text while clients receive text
+                if any(q.format != "binary" for q in live) != self.text_wanted.is_set():
+                    if self.text_wanted.is_set():
+                        self.text_wanted.clear()
+                        texts.clear()
+                    else:
+                        self.text_wanted.set()
+                finished = self.finished.is_set()
+                now = time.monotonic()
+                navail = ring.seq - seq
+                if navail >= self.batch_size or (navail and now - tsent >= self.batch_interval) or finished:
+                    tsent = now
                     while True:
-                        inp = self.data_queue.get()
-                        if dbg:
-                            print("sending", inp)
-                        await websocket.send(inp)
-                        if inp == '\n':
-                            if dbg:
-                                print("received empty input -> end")
+                        seq, rows, tstamps, lost = ring.read(seq, nmax)
+                        Nlost += lost
+                        if not len(rows):
                             break
+                        publish(rows, tstamps)
+                        await asyncio.sleep(0)  # let clients be served
+                if finished:
+                    break
+                await asyncio.sleep(poll)
 
-        # start web service
-        print('** server running under uri ws://' + host + ':', port)
-        start_server = websockets.serve(data_provider, host, port)
-        asyncio.get_event_loop().run_until_complete(start_server)
-        asyncio.get_event_loop().run_forever()
+            # empty record to inform clients, wait until sent
+            done = True
+            for q in live:
+                put(q, '\n')
+            if senders:
+                await asyncio.wait(list(senders.values()), timeout=2.0)
+            if Nlost:
+                print("** websocket server: {0} samples lost".format(Nlost))
@@ -26,7 +26,19 @@ __all__ = [
     "Display",
     "DataLogger",
     "DataRecorder",
+    "BinaryData",
+    "SegmentArchive",
+    "DataRing",
+    "SharedRing",
+    "HighRateReadout",
+    "DeviceReadout",
+    "LatencyStats",
+    "PluginRegistry",
+    "OutputBus",
+    "CalibrationEngine",
+    "FormulaEngine",
     "DataGraphs",
+    "HistoryBuffer",
     "DataSpectrum",
     "ReplayConfig",
     "ToyDataConfig",
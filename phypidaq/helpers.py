@@ -1,9 +1,20 @@
 """helper functions"""
 
 import os
+import collections
+import copy
 import errno
+import threading
 import time
+import numpy as np
 from scipy import interpolate
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .BinaryData import packFrame
 # for controlGUI
 
 
@@ -60,78 +71,231 @@ def keyboard_wait(prompt=None):
 
 
 class DAQwait(object):
-    """class implementing sleep corrected with system time"""
+    """class implementing waits until absolute deadlines t0 + k*dt
+
+    deadlines are taken from the monotonic clock, so that timing
+    errors do not accumulate over long runs; optionally, the last
+    part of the waiting time is spent in a busy loop ("spin")
+    for sub-millisecond precision
+    """
 
-    def __init__(self, dt):
+    def __init__(self, dt, spin=0.0):
         """Args:
-        dt: wait time in seconds
+        dt:   wait time in seconds
+        spin: time before deadline (in s) spent in busy loop, e.g. 0.0003
         """
         self.dt = dt
+        self.spin = spin
         self.lag = False  # indicate occurrence of time lag
-        self.T0 = time.time()
+        self.missed = 0  # number of missed deadlines
+        self.slack = 0.0  # time left before last deadline (negative if late)
+        self.reset()
+
+    def reset(self):
+        """restart schedule now, e.g. after a pause"""
+        self.tnext = time.monotonic() + self.dt  # next deadline
 
     def __call__(self, T0=None):
-        """guarantee correct timing
+        """wait until next deadline
         Args:
-          TO:   start time of action to be timed
-                  if not given, take end-time of last wait
+          TO:   start time (from time.time()) of action to be timed;
+                  if given, the schedule is restarted at T0
         """
         if T0 is not None:
-            self.T0 = T0
-        dtcor = self.dt - time.time() + self.T0
+            self.tnext = time.monotonic() - time.time() + T0 + self.dt
+        dtcor = self.tnext - time.monotonic()
+        self.slack = dtcor
         if dtcor > 0.0:
-            time.sleep(dtcor)
+            if dtcor > self.spin:
+                time.sleep(dtcor - self.spin)
+            while time.monotonic() < self.tnext:
+                pass
             self.lag = False
+            self.tnext += self.dt
         else:
+            # deadline missed, skip to next deadline in the future
             self.lag = True
-        self.T0 = time.time()  # end of sleep = start of next interval
+            n = int(-dtcor // self.dt) + 1
+            self.missed += n
+            self.tnext += n * self.dt
 
 
 class RingBuffer(object):
-    """ring buffer to store N objects"""
+    """ring buffer to store the latest N samples
 
-    # implemented as a simple list, where old entries
-    #  are overwritten if length of list is exceeded
+    samples are kept in a preallocated numpy array of shape (N, NChannels),
+    optionally with one time stamp per sample; memory use is fixed
+    """
 
-    def __init__(self, N):
+    def __init__(self, N, NChannels=None, tstamps=False):
         """
         N: size of buffer
+        NChannels: number of channels per sample, taken from first sample if None
+        tstamps: store time stamps of samples
         """
         self.N = N
-        self.B = [None] * N  # initialize a list
-        self.full = False
-        self.k = -1
+        self.withTstamps = tstamps
+        self.B = None  # data, one sample per row
+        self.T = None  # time stamps
+        self.n = 0  # number of samples stored
+        self.shared = False  # arrays shared with a snapshot
+        if NChannels is not None:
+            self._allocate(NChannels)
+
+    def _allocate(self, NChannels):
+        self.NChannels = NChannels
+        self.B = np.zeros((self.N, NChannels))
+        if self.withTstamps:
+            self.T = np.zeros(self.N)
+
+    def __len__(self):
+        """number of samples in buffer"""
+        return min(self.n, self.N)
+
+    def store(self, d, t=None):
+        """
+        d: data of one sample
+        t: time stamp, current time if None
+        """
+        self.store_block(np.atleast_2d(d), None if t is None else [t])
 
-    def store(self, d):
+    def store_block(self, data, tstamps=None):
         """
-        d: data object
+        data: block of samples, one sample per row
+        tstamps: time stamps of samples, current time if None
         """
+        data = np.atleast_2d(data)
+        if self.B is None:
+            self._allocate(data.shape[1])
+        # copy arrays shared with snapshot before modifying them
+        if self.shared:
+            self.B = self.B.copy()
+            if self.T is not None:
+                self.T = self.T.copy()
+            self.shared = False
+        if self.T is not None:
+            tstamps = np.full(len(data), time.time()) if tstamps is None else np.atleast_1d(tstamps)
+        m = len(data)
+        if m > self.N:  # keep only the latest N samples
+            self.n += m - self.N
+            data = data[-self.N :]
+            if self.T is not None:
+                tstamps = tstamps[-self.N :]
+            m = self.N
+        k = self.n % self.N
+        m1 = min(m, self.N - k)  # samples up to end of buffer ...
+        self.B[k : k + m1] = data[:m1, : self.NChannels]
+        if m1 < m:  # ... and remaining samples at start
+            self.B[: m - m1] = data[m1:, : self.NChannels]
+        if self.T is not None:
+            self.T[k : k + m1] = tstamps[:m1]
+            if m1 < m:
+                self.T[: m - m1] = tstamps[m1:]
+        self.n += m
 
-        # increment index, eventually overwrite oldest data
-        self.k += 1
-        if self.k == self.N:
-            self.k = 0
-            self.full = True
-        # store data
-        self.B[self.k] = d
+    def _views(self, a):
+        # parts of array a in time order
+        if a is None:
+            return []
+        if self.n <= self.N:
+            return [a[: self.n]]
+        k = self.n % self.N
+        return [a[k:], a[:k]] if k else [a]
+
+    def views(self):
+        """data in time order as list of (at most two) views, without copying"""
+        return self._views(self.B)
 
     def read(self):
-        """return all data"""
+        """return all data in time order as one array of shape (n, NChannels)"""
+        if self.B is None:
+            return np.zeros((0, 0))
+        return np.concatenate(self.views())
+
+    def read_tstamps(self):
+        """return time stamps in time order (None if not stored)"""
+        if self.T is None:
+            return None
+        return np.concatenate(self._views(self.T))
+
+    def snapshot(self):
+        """return copy of buffer in constant time
+
+        the copy shares the arrays with the buffer, which copies them
+        before the next store (copy on write); thus, the snapshot
+        can be read in a background thread while data are stored
+        """
+        snap = copy.copy(self)
+        self.shared = True
+        return snap
+
+
+_linefmts = {}  # format of csv line by number of values
+
+
+def formatValues(block):
+    """format channel values of block of samples as csv, one line per sample"""
+    block = np.atleast_2d(block)
+    n = block.shape[1]
+    if n not in _linefmts:
+        _linefmts[n] = ",".join(["%.4g"] * n) + "\n"
+    return (_linefmts[n] * len(block)) % tuple(block.ravel().tolist())
 
-        if self.full:
-            return self.B[self.k :] + self.B[: self.k]
-        else:
-            return self.B[: self.k]
+
+def formatCSV(block, n0, interval, seq=False, values=None):
+    """format block of samples as csv, one line per sample, with time from sample number
+
+    block:    array of samples, one sample per row
+    n0:       number of first sample, or array of sample numbers
+    interval: time between samples
+    seq:      sample number as first column
+    values:   channel values already formatted by formatValues() (text or list of lines),
+              only time and sample number are added
+    """
+    nums = n0 + np.arange(len(block)) if np.isscalar(n0) else n0
+    if values is None:
+        values = formatValues(block)
+    if isinstance(values, str):
+        values = values.splitlines(True)
+    prefix = "{0:d},{1:.3f}," if seq else "{1:.3f},"
+    return "".join(prefix.format(int(n), n * interval) + line for n, line in zip(nums, values))
 
 
 class FifoManager(object):
-    """open a fifo (linux pipe) to transfer data to external process"""
+    """transfer data to external process via a fifo (linux pipe)
+
+    Data are queued and written by a background thread, so that the
+    read-out never waits for the reading process. The fifo is opened
+    as soon as a reader is present; if the reader goes away, the fifo
+    is opened again for the next reader. If the queue is full, the
+    oldest or the newest data are dropped, or the caller waits.
+
+    Data are written in csv format, one line per sample with time and
+    channel values, in csv format with the sample number as first column
+    (csv_seq), or as binary frames (see BinaryData.packFrame()).
 
-    def __init__(self, fname):
+    With formats csv_seq and binary, samples sent during the last
+    retention seconds (at most 64 MB) are kept, also while no reader is
+    present or data are dropped from the queue. A reader resuming after
+    a disconnect writes the number n of the first sample it needs to the
+    file <fname>.since before opening the fifo; all kept samples from
+    number n on are then written before new data.
+    """
+
+    def __init__(self, fname, interval=1.0, maxsize=1000, overflow="drop_oldest", fmt="csv", retention=10.0):
         """open fifo
         fname: name of fifo
+        interval: time between samples, for time column in csv format
+        maxsize: maximum number of blocks in queue
+        overflow: policy if queue is full: drop_oldest, drop_newest or block
+        fmt: data format csv, csv_seq (csv with sample number) or binary
+        retention: time (s) samples are kept for resuming readers (csv_seq and binary)
         """
 
+        if overflow not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError("unknown overflow policy '{0}'".format(overflow))
+        if fmt not in ("csv", "csv_seq", "binary"):
+            raise ValueError("unknown fifo format '{0}'".format(fmt))
         try:
             os.mkfifo(fname)
         except OSError as e:
@@ -140,10 +304,173 @@ class FifoManager(object):
                 print(e)
                 raise
 
-        self.fifo = open(fname, "w", 1)
+        self.fname = fname
+        self.interval = interval
+        self.overflow = overflow
+        self.fmt = fmt
+        self.queue = queue.Queue(maxsize)
+        self.retained = collections.deque()  # blocks sent during retention time
+        self.Nretained = 0
+        # resuming needs sample numbers in the data
+        self.maxRetained = int(retention / interval) if interval > 0 and fmt != "csv" else 0
+        self.lock = threading.Lock()  # protects retained blocks
+        self.nextSample = 0  # number of next sample to write, earlier ones are skipped
+        self.Ndropped = 0  # number of samples dropped
+        self.fd = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._writer, name="FifoManager")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _put(self, item, n):
+        """queue item with n samples according to overflow policy"""
+        if self.overflow == "block":
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow == "drop_newest":
+                    self.Ndropped += n
+                    return
+            try:  # drop oldest
+                old = self.queue.get_nowait()
+                self.Ndropped += len(old[0]) if isinstance(old, tuple) else 1
+            except queue.Empty:
+                pass
 
     def __call__(self, d):
-        print(d, end="", file=self.fifo)
+        """send text d"""
+        if d:
+            self._put(d, 1)
+
+    def send(self, block, n0, tstamps=None, text=None):
+        """send block of samples, one sample per row
+
+        block: array of samples
+        n0: number of first sample
+        tstamps: time stamps of samples, current time if None
+        text: function returning the channel values as csv text (e.g. Block.csv),
+              called only for csv formats; values are formatted here if None
+        """
+        # copy, block may be overwritten by next read-out (not needed for read-only blocks of OutputBus)
+        if not isinstance(block, np.ndarray) or block.flags.writeable:
+            block = np.array(block)
+        if tstamps is None:
+            tstamps = np.full(len(block), time.time())
+        elif not isinstance(tstamps, np.ndarray) or tstamps.flags.writeable:
+            tstamps = np.array(tstamps)
+        item = (block, tstamps, n0, text)
+        self._retain(item)
+        self._put(item, len(block))
+
+    def _open(self):
+        """wait for reader and open fifo, return False if stopped"""
+        while not self.stopped.is_set():
+            try:
+                self.fd = os.open(self.fname, os.O_WRONLY | os.O_NONBLOCK)
+                os.set_blocking(self.fd, True)  # background thread may wait for reader
+                self._resume()
+                return True
+            except OSError as e:
+                if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                    raise
+                time.sleep(0.05)
+        return False
+
+    def _format(self, item, k=0):
+        """format queued item from its k-th sample on"""
+        block, tstamps, n0, text = item
+        if self.fmt == "binary":
+            return packFrame(n0 + k, tstamps[k:], block[k:])
+        values = None if text is None else text().splitlines(True)[k:]
+        return formatCSV(block[k:], n0 + k, self.interval, seq=self.fmt == "csv_seq", values=values).encode()
+
+    def _write(self, out):
+        """write bytes to fifo, return False if reader has gone"""
+        if self.fd is None:
+            return False
+        try:
+            view = memoryview(out)
+            while len(view):
+                view = view[os.write(self.fd, view) :]
+            return True
+        except BrokenPipeError:  # reader has gone, wait for next one
+            os.close(self.fd)
+            self.fd = None
+            return False
 
-    def close(self):
-        self.fifo.close()
+    def _retain(self, item):
+        """keep sent block for resuming readers"""
+        if self.maxRetained <= 0:
+            return
+        block = item[0]
+        width = block.shape[1] if block.ndim > 1 else 1
+        maxRetained = min(self.maxRetained, 2**23 // width)  # limit memory to 64 MB
+        with self.lock:
+            self.retained.append(item)
+            self.Nretained += len(block)
+            while self.Nretained - len(self.retained[0][0]) >= maxRetained:
+                self.Nretained -= len(self.retained.popleft()[0])
+
+    def _resume(self):
+        """write kept samples requested by new reader in file <fname>.since"""
+        try:
+            with open(self.fname + ".since") as f:
+                since = int(f.read())
+            os.remove(self.fname + ".since")
+        except (OSError, ValueError):
+            return
+        if self.fmt == "csv":
+            print("!!! FifoManager: resuming reader needs FifoFormat csv_seq or binary")
+            return
+        with self.lock:
+            retained = list(self.retained)
+        for item in retained:
+            block, n0 = item[0], item[2]
+            k = max(0, since - n0)
+            if k < len(block):
+                if not self._write(self._format(item, k)):
+                    return
+                self.nextSample = n0 + len(block)  # queued samples are skipped up to here
+
+    def _writer(self):
+        """background thread: format queued data and write to fifo"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.fd is None and not self._open():
+                break
+            if isinstance(item, tuple):
+                block, n0 = item[0], item[2]
+                k = max(0, self.nextSample - n0)  # samples already written for resuming reader
+                if k >= len(block):
+                    continue
+                out = self._format(item, k)
+                self.nextSample = n0 + len(block)
+            else:
+                out = item.encode()
+            self._write(out)
+        if self.fd is not None:
+            os.close(self.fd)  # end of file for reader
+            self.fd = None
+
+    def close(self, timeout=2.0):
+        """write queued data (waiting at most timeout seconds for a reader) and close fifo"""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        if self.thread.is_alive():  # no reader or reader not reading: discard remaining data
+            self.stopped.set()
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put(None)
+            self.thread.join(timeout)
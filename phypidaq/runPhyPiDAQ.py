@@ -21,9 +21,6 @@ import numpy as np
 import threading
 import multiprocessing as mp
 
-# math module needed for formulae
-from math import *
-
 # Display module
 # only imported if needed: phypidaq.DisplayManager import DisplayManager
 # Webserver
@@ -33,9 +30,15 @@ from .DataRecorder import DataRecorder
 
 # other helper functions
 from .helpers import DAQwait
+from .LatencyStats import LatencyStats
+from .OutputBus import OutputBus
+
+# device and output classes, imported on first use
+from .PluginRegistry import devices, sinks
 
 # modules imported only if needed
-# from .helpers import generateCalibrationFunction
+# from .CalibrationEngine import CalibrationEngine
+# from .FormulaEngine import FormulaEngine
 # from .helpers import RingBuffer
 
 # ----- class for running data acquisition --------------------
@@ -62,7 +65,7 @@ class runPhyPiDAQ(object):
             U = "\033[4;37;48m"  # underline
             E = "\033[1;37;0m"  # end color
             # prompt for user input
-            prompt = "   type -> P(ause), R(esume), E(nd) or s(ave) + <ret> "
+            prompt = "   type -> P(ause), R(esume), E(nd), s(ave) or t(iming) + <ret> "
 
         status = tc.b + tc.g + "Running" + tc.E if self.DAQ_ACTIVE else tc.b + tc.y + "Paused " + tc.E
         print("\r" + 5 * " " + status + 5 * " " + tc.prompt, end="")
@@ -100,28 +103,49 @@ class runPhyPiDAQ(object):
             self.DAQ_ACTIVE = True
             rc = 1
         elif cmd == "s":
-            self.DAQ_ACTIVE = False
-            if self.sumData is not None:
-                print("\n storing data to file ", self.bufferFile, " - now paused")
-                print(42 * " " + "  -> R(esume), E(nd) + <ret> ", end="", flush=True)
-                datRec = DataRecorder(self.bufferFile, self.PhyPiConfDict)
-                datRec(self.sumData)
-            elif self.RBuf is not None:
-                print("\n storing data to file ", self.bufferFile, " - now paused")
-                print(42 * " " + "  -> R(esume), E(nd) + <ret> ", end="", flush=True)
-                self.storeBufferData(self.bufferFile)
+            if self.saveThread is not None and self.saveThread.is_alive():
+                print("\n storing of data still in progress - no action")
+            elif self.sumData is not None or self.RBuf is not None:
+                # snapshot of data, written to file in background
+                with self.bufLock:  # buffer is filled by output thread
+                    if self.sumData is not None:
+                        snapshot = self.sumData.copy()
+                    else:
+                        snapshot = self.RBuf.snapshot()
+                print("\n storing data to file ", self.bufferFile, " in background")
+                self.saveThread = threading.Thread(
+                    target=self.storeBufferData, args=(self.bufferFile, snapshot), name="storeBufferData"
+                )
+                self.saveThread.start()
             else:
                 print("\n buffer storage not active - no action")
             rc = 1
+        elif cmd == "t":
+            print("\n" + self.stats.table())
+            rc = 1
 
         self.prompt()  # update status
         return rc
 
-    def storeBufferData(self, fnam):
-        bufRec = DataRecorder(fnam, self.PhyPiConfDict)
-        for d in self.RBuf.read():
-            bufRec(d)
+    def reportStats(self):
+        """print summary line of stage timing and write statistics file"""
+        print("\n  " + self.stats.summary())
+        if self.StatsFile is not None:
+            self.stats.write(self.StatsFile)
+        self.prompt()
+
+    def storeBufferData(self, fnam, snapshot):
+        """write snapshot of summed data or of ring buffer to file, run as background thread"""
+        # single file, without rotation and compression of the recording
+        conf = {k: v for k, v in self.PhyPiConfDict.items() if k not in ("RotateSize", "RotateInterval", "Compression")}
+        bufRec = DataRecorder(fnam, conf)
+        if isinstance(snapshot, np.ndarray):
+            bufRec(snapshot)
+        elif len(snapshot):
+            bufRec(snapshot.read(), snapshot.read_tstamps())
         bufRec.close()
+        print("\n data stored to file ", bufRec.f.name)
+        self.prompt()
 
     def setup(self):
         """
@@ -131,11 +155,18 @@ class runPhyPiDAQ(object):
         PhyPiConfDict:       dictionary with config options
         DEVs:                list of instances of device classes
         ChanIdx_ofDevice:    index to store 1st channel of device i
+        BlockSize:           number of samples per read-out of devices
+        HighRate:            read devices in background thread, no lower limit on Interval
+        Readout:             concurrent or scheduled read-out of several devices
+                             (instance of ParallelReadout or ScheduledReadout)
         NHWChannels          number of active hardware channels
-        CalibFuncts:         functions for calibration of raw channel readings
+        CalibFuncts:         calibration of raw channel readings (CalibrationEngine)
         Formulae:            list of formulae to apply to hardware channels
         NFormulae:           number of formulae
+        FormulaEngine:       compiled formulae, applied to data
         DatRec:              instance of DataRecorder
+        Sinks:               list of names and instances of output plugins
+        stats:               timing of processing stages (LatencyStats)
         """
 
         # check for / read command line arguments
@@ -162,13 +193,26 @@ class runPhyPiDAQ(object):
             exit(1)
 
         # set default options:
+        IntervalGiven = "Interval" in PhyPiConfDict
         if "Interval" not in PhyPiConfDict:
             PhyPiConfDict["Interval"] = self.interval
         else:
             self.interval = PhyPiConfDict["Interval"]
-        if PhyPiConfDict["Interval"] < 0.05:
-            print(" !!! read-out intervals < 0.05 s not reliable, setting to 0.05 s")
-            PhyPiConfDict["Interval"] = 0.05
+
+        if "BlockSize" not in PhyPiConfDict:  # number of samples per read-out
+            PhyPiConfDict["BlockSize"] = 1
+
+        if "HighRate" not in PhyPiConfDict:  # read-out in background thread
+            PhyPiConfDict["HighRate"] = False
+
+        if "TimerSpin" not in PhyPiConfDict:  # busy wait before deadlines (in s)
+            PhyPiConfDict["TimerSpin"] = 0.0
+
+        if "StatsInterval" not in PhyPiConfDict:  # period of timing summary (in s)
+            PhyPiConfDict["StatsInterval"] = None
+
+        if "StatsFile" not in PhyPiConfDict:  # file for timing statistics
+            PhyPiConfDict["StatsFile"] = None
 
         if "NHistoryPoints" not in PhyPiConfDict:  # length of stored history
             PhyPiConfDict["NHistoryPoints"] = 120
@@ -185,6 +229,36 @@ class runPhyPiDAQ(object):
         if "startActive" not in PhyPiConfDict:  # default is to start in Paused mode
             PhyPiConfDict["startActive"] = False
 
+        if "OutputQueueSize" not in PhyPiConfDict:  # blocks of samples pending per output sink
+            PhyPiConfDict["OutputQueueSize"] = 1000
+
+        if "FifoFormat" not in PhyPiConfDict:  # data format for fifo: csv, csv_seq or binary
+            PhyPiConfDict["FifoFormat"] = "csv"
+
+        if "FifoQueueSize" not in PhyPiConfDict:  # blocks of samples queued for fifo
+            PhyPiConfDict["FifoQueueSize"] = 1000
+
+        if "FifoOverflow" not in PhyPiConfDict:  # if fifo queue full: drop_oldest, drop_newest or block
+            PhyPiConfDict["FifoOverflow"] = "drop_oldest"
+
+        if "FifoRetention" not in PhyPiConfDict:  # time (s) samples are kept for resuming fifo readers
+            PhyPiConfDict["FifoRetention"] = 10.0
+
+        if "WebsocketPort" not in PhyPiConfDict:  # port of websocket server
+            PhyPiConfDict["WebsocketPort"] = 8314
+
+        if "WebsocketQueueSize" not in PhyPiConfDict:  # messages queued per websocket client
+            PhyPiConfDict["WebsocketQueueSize"] = 100
+
+        if "WebsocketBatchSize" not in PhyPiConfDict:  # samples collected before sending to websocket clients
+            PhyPiConfDict["WebsocketBatchSize"] = 1000
+
+        if "WebsocketBatchInterval" not in PhyPiConfDict:  # max. time (s) samples are collected before sending
+            PhyPiConfDict["WebsocketBatchInterval"] = 0.05
+
+        if "WebsocketRetention" not in PhyPiConfDict:  # time (s) samples are kept for resuming websocket clients
+            PhyPiConfDict["WebsocketRetention"] = 10.0
+
         # read Device configuration(s) and instantiate device handler(s)
         if "DeviceFile" in PhyPiConfDict:
             DevFiles = PhyPiConfDict["DeviceFile"]
@@ -222,14 +296,19 @@ class runPhyPiDAQ(object):
             if "DAQModule" in DEVconfDicts[i]:
                 DEVNames.append(DEVconfDicts[i]["DAQModule"])
             else:  # try to derive from name of Device Config File
-                cdir, cfnam = os.path.split(DeviceFiles[i])
+                cdir, cfnam = os.path.split(DevFiles[i])
                 DEVNames.append(cfnam.split(".")[0])
 
             if self.verbose:
                 print("  configuring device " + DEVNames[i])
-            # import device class ...
-            exec("from ." + DEVNames[i] + " import " + DEVNames[i], globals(), globals())
-            exec("DEVs.append(" + DEVNames[i] + "(DEVconfDicts[i]) ), globals(), locals()")
+            # import device class and instantiate device
+            try:
+                DEVclass = devices.get(DEVNames[i])
+            except ImportError as e:
+                print("!!! failed to import device module " + DEVNames[i])
+                print(str(e))
+                exit(1)
+            DEVs.append(DEVclass(DEVconfDicts[i]))
             DEVs[i].init()
             ChanIdx_ofDevice.append(NHWChannels)
             nC = DEVs[i].NChannels
@@ -241,27 +320,76 @@ class runPhyPiDAQ(object):
             except (TypeError, AttributeError):
                 ChanUnits = None
 
+        # devices with own read-out interval (given in device config)
+        DevIntervals = [DEVconfDicts[i].get("Interval") for i in range(NDevices)]
+        scheduled = [dt for dt in DevIntervals if dt is not None]
+        if scheduled and not IntervalGiven:
+            # default: interval of fastest device
+            PhyPiConfDict["Interval"] = min(scheduled)
+            self.interval = PhyPiConfDict["Interval"]
+
+        # block read-out only if supported by all devices read in every cycle
+        if PhyPiConfDict["BlockSize"] > 1:
+            noBlock = [
+                DEVNames[i] for i in range(NDevices) if DevIntervals[i] is None and not hasattr(DEVs[i], "acquireBlock")
+            ]
+            if noBlock:
+                print(" !!! block read-out not supported by " + ", ".join(noBlock) + " - reading single samples")
+                PhyPiConfDict["BlockSize"] = 1
+        self.BlockSize = PhyPiConfDict["BlockSize"]
+
+        # a read-out cycle (of BlockSize samples) must not be shorter than 0.05 s,
+        #  unless devices are read in a background thread (HighRate mode)
+        self.HighRate = PhyPiConfDict["HighRate"]
+        if not self.HighRate and PhyPiConfDict["Interval"] * self.BlockSize < 0.05:
+            if self.BlockSize > 1:
+                print(" !!! read-out cycles < 0.05 s not reliable, increasing Interval")
+            else:
+                print(" !!! read-out intervals < 0.05 s not reliable, setting to 0.05 s")
+            PhyPiConfDict["Interval"] = 0.05 / self.BlockSize
+            self.interval = PhyPiConfDict["Interval"]
+
         self.DEVs = DEVs
         self.ChanIdx_ofDevice = ChanIdx_ofDevice
+
+        # read several devices concurrently, off by default: most devices share one I2C or SPI bus;
+        #   devices on the same bus (option Bus in device configuration) are never read at the same time
+        DevBuses = [DEVconfDicts[i].get("Bus") for i in range(NDevices)]
+        if "ParallelReadout" not in PhyPiConfDict:
+            PhyPiConfDict["ParallelReadout"] = False
+        if scheduled:
+            # poll devices with own interval, the others in every cycle
+            from .DeviceReadout import ScheduledReadout
+
+            if self.verbose:
+                for i in range(NDevices):
+                    if DevIntervals[i] is not None:
+                        print("  reading " + DEVNames[i] + " every " + str(DevIntervals[i]) + " s")
+            self.Readout = ScheduledReadout(
+                DEVs, ChanIdx_ofDevice, DevIntervals, PhyPiConfDict["ParallelReadout"], DevBuses
+            )
+        elif PhyPiConfDict["ParallelReadout"] and NDevices > 1:
+            from .DeviceReadout import ParallelReadout, busLocks
+
+            self.Readout = ParallelReadout(DEVs, ChanIdx_ofDevice, busLocks(DevBuses))
+        else:
+            self.Readout = None
         self.ChanLims = ChanLims
         self.ChanNams = ChanNams
         self.ChanUnits = ChanUnits
         self.NHWChannels = NHWChannels
 
-        # set up calibration Functions
+        # set up calibration of all channels
         CalibFuncts = None
         if "ChanCalib" in PhyPiConfDict:
-            from .helpers import generateCalibrationFunction
+            from .CalibrationEngine import CalibrationEngine
 
-            CalibFuncts = [None] * NHWChannels
             calibData = PhyPiConfDict["ChanCalib"]
             if self.verbose > 1:
                 print("  Calibrating channels:")
                 for ic in range(NHWChannels):
                     print("   Chan ", ic, "   ", calibData[ic])
-            for ic in range(NHWChannels):
-                if calibData[ic] is not None:
-                    CalibFuncts[ic] = generateCalibrationFunction(calibData[ic])
+            CalibFuncts = CalibrationEngine(calibData, NHWChannels)
         self.CalibFuncts = CalibFuncts
 
         # Apply Formula(e) to calibrated channel reading(s)
@@ -277,9 +405,20 @@ class runPhyPiDAQ(object):
                         print("   FChan ", ifc, "   ", Formulae[ifc])
         self.Formulae = Formulae
         self.NFormulae = NFormulae
+        # validate and compile formulae once
+        self.FormulaEngine = None
+        if NFormulae:
+            from .FormulaEngine import FormulaEngine
+
+            try:
+                self.FormulaEngine = FormulaEngine(Formulae, NHWChannels)
+            except ValueError as e:
+                print("!!! invalid entry in ChanFormula: " + str(e))
+                exit(1)
         # re-set number of Channels if Formulae are defined
         nc = NFormulae if NFormulae else NHWChannels
         PhyPiConfDict["NChannels"] = nc
+        self.NChannels = nc
 
         # Add information for graphical display(s) to PhyPiConfDict
         if "ChanNams" not in PhyPiConfDict:
@@ -335,9 +474,11 @@ class runPhyPiDAQ(object):
         if self.bufferFile is not None:
             from .helpers import RingBuffer
 
-            self.RBuf = RingBuffer(PhyPiConfDict["NHistoryPoints"])
+            self.RBuf = RingBuffer(PhyPiConfDict["NHistoryPoints"], nc, tstamps=True)
         else:
             self.RBuf = None
+        self.saveThread = None  # background thread storing buffer data
+        self.bufLock = threading.Lock()  # protects buffer while taking snapshot
 
         if PhyPiConfDict["DisplayModule"] == "DataSpectrum":
             self.sumData = np.zeros(nc)
@@ -355,7 +496,14 @@ class runPhyPiDAQ(object):
             print("   start process reading from fifo")
             from .helpers import FifoManager
 
-            self.send_to_fifo = FifoManager(self.DAQfifo)
+            self.send_to_fifo = FifoManager(
+                self.DAQfifo,
+                interval=PhyPiConfDict["Interval"],
+                maxsize=PhyPiConfDict["FifoQueueSize"],
+                overflow=PhyPiConfDict["FifoOverflow"],
+                fmt=PhyPiConfDict["FifoFormat"],
+                retention=PhyPiConfDict["FifoRetention"],
+            )
 
         # Configure a websocket for data transfer
         if "DAQwebsocket" in PhyPiConfDict:
@@ -369,12 +517,31 @@ class runPhyPiDAQ(object):
             print("PhyPiDAQ: opening websocket")
             print("   start process reading websocket")
             try:
-                self.send_to_websocket = WebsocketManager(interval=self.interval, config_dict=PhyPiConfDict)
+                self.send_to_websocket = WebsocketManager(
+                    interval=PhyPiConfDict["Interval"],
+                    config_dict=PhyPiConfDict,
+                    port=PhyPiConfDict["WebsocketPort"],
+                    queue_size=PhyPiConfDict["WebsocketQueueSize"],
+                    batch_size=PhyPiConfDict["WebsocketBatchSize"],
+                    batch_interval=PhyPiConfDict["WebsocketBatchInterval"],
+                    retention=PhyPiConfDict["WebsocketRetention"],
+                )
             except Exception as e:
                 print("!!! failed to set up websocket !!!")
                 print(e)
                 exit(1)
 
+        # output plugins, called with each block of samples (see OutputBus.Block)
+        self.Sinks = []
+        for name in PhyPiConfDict.get("OutputSinks") or []:
+            try:
+                self.Sinks.append((name, sinks.get(name)(PhyPiConfDict)))
+            except Exception as e:
+                print("!!! failed to set up output plugin", name)
+                print(e)
+                exit(1)
+        self.bus = None  # set up by initOutput()
+
         # LED indicators on GPIO pins
         if "RunLED" in PhyPiConfDict or "ReadoutLED" in PhyPiConfDict:
             from .pulseGPIO import PulseGPIO
@@ -387,26 +554,129 @@ class runPhyPiDAQ(object):
         else:
             self.ReadoutLED = None
 
+        # timing of processing stages
+        self.stats = LatencyStats()
+        self.StatsFile = PhyPiConfDict["StatsFile"]
+
         # Print configuration
         if self.verbose > 1:
             print("\nPhyPiDAQ Configuration:")
             print(yaml.dump(PhyPiConfDict))
         self.PhyPiConfDict = PhyPiConfDict
 
+    def initBuffers(self):
+        """
+        set up space for data: a block of samples with time stamps,
+        self.data is the first (or only) sample of the block
+        """
+
+        self.block = np.zeros((self.BlockSize, max(self.NChannels, self.NHWChannels)))
+        self.data = self.block[0]
+        self.tstamps = np.zeros(self.BlockSize)
+
+    def readDevices(self):
+        """
+        read one sample or, if BlockSize > 1, a block of samples
+        from all devices into self.block, and set time stamps
+        """
+
+        if self.Readout is not None:
+            if self.BlockSize > 1:
+                self.tstamps[:] = self.Readout.acquireBlock(self.block, self.BlockSize)
+            else:
+                self.Readout.acquireData(self.data)
+                self.tstamps[0] = time.time()
+        elif self.BlockSize > 1:
+            for i, DEV in enumerate(self.DEVs):
+                ts = DEV.acquireBlock(self.block[:, self.ChanIdx_ofDevice[i] :], self.BlockSize)
+                if i == 0:  # time stamps of first device
+                    self.tstamps[:] = ts
+        else:
+            for i, DEV in enumerate(self.DEVs):
+                DEV.acquireData(self.data[self.ChanIdx_ofDevice[i] :])
+            self.tstamps[0] = time.time()
+
+    def acquire(self):
+        """
+        read data from devices, apply calibrations and formulae
+
+        returns: block of samples (one sample per row) and time stamps
+        """
+
+        t = time.perf_counter()
+        self.readDevices()
+        t = self.stats.mark("readout", t)
+        # eventually calibrate raw readings
+        if self.CalibFuncts:
+            self.apply_calibs()
+            t = self.stats.mark("calibration", t)
+        # eventually apply formula(e)
+        if self.Formulae:
+            self.apply_formulae()
+            self.stats.mark("formulae", t)
+        return self.block[:, : self.NChannels], self.tstamps
+
+    def initOutput(self):
+        """
+        set up output bus: display, buffer, file, fifo, websocket and
+        output plugins subscribe and are served in their own threads
+        """
+
+        self.bus = OutputBus(self.PhyPiConfDict["OutputQueueSize"], stats=self.stats)
+        # display data, may skip blocks if lagging
+        if self.display_manager is not None:
+            self.bus.subscribe("display", lambda b: self.display_manager.showData(b.data, b.tstamps), lossless=False)
+        # sum or store (latest) data in buffer ...
+        if self.sumData is not None or self.RBuf is not None:
+            self.bus.subscribe("buffer", self.bufferData)
+        # ... and record all data to disc ...
+        if self.DatRec:
+            self.bus.subscribe("recorder", lambda b: self.DatRec(b.data, b.tstamps, b.csv))
+        # ... queue data for fifo, formatted in background ...
+        if self.DAQfifo:
+            self.bus.subscribe("fifo", lambda b: self.send_to_fifo.send(b.data, b.seq, b.tstamps, b.csv))
+        # ... publish for websocket clients ...
+        if self.DAQwebsocket:
+            self.bus.subscribe("websocket", lambda b: self.send_to_websocket.send(b.data, b.seq, b.tstamps, b.csv))
+        # ... and pass to output plugins
+        for name, sink in self.Sinks:
+            self.bus.subscribe(name, sink)
+
+    def bufferData(self, b):
+        """cumulative sum of data (for histograms or spectra), else store latest data in ring buffer"""
+        with self.bufLock:
+            if self.sumData is not None:
+                self.sumData += b.data.sum(axis=0)
+            else:
+                self.RBuf.store_block(b.data, b.tstamps)
+
+    def outputData(self, block, n0, tstamps=None, copy=True):
+        """
+        publish block of samples to output bus, i.e. to display, buffer, file, fifo and websocket
+
+        block:   array of samples, one sample per row
+        n0:      number of first sample in block (counting from 1)
+        tstamps: time stamps of samples
+        copy:    copy block and tstamps, False if not modified by caller afterwards
+        """
+
+        t = time.perf_counter()
+        self.bus.publish(block, n0, tstamps, copy=copy)
+        self.stats.mark("publish", t)
+
     def apply_calibs(self):
         """
         apply calibration functions to hardware channels
 
         input: Calibration Functions as calculated by
                generateCalibrationFunctions() from interpolated
-               values in calibration table calibData[]
+               values in calibration table calibData[],
+               converted to polynomials by CalibrationEngine
 
-        output: calibrated channel values
+        output: calibrated channel values (for all samples in block)
         """
 
-        for i in range(self.NHWChannels):
-            if self.CalibFuncts[i] is not None:
-                self.data[i] = self.CalibFuncts[i](self.data[i])
+        self.CalibFuncts(self.block)
 
     def apply_formulae(self):
         """
@@ -414,7 +684,7 @@ class runPhyPiDAQ(object):
          replace entries in data by calculated quantities
 
         input:  - data from hardware channels
-                - list of formulae
+                - list of formulae, compiled by FormulaEngine
                 data in hw channels c0, c1, ...
 
         formula expressions are valid python expressions, where
@@ -426,15 +696,7 @@ class runPhyPiDAQ(object):
         number of formulae may exceed number of hardware channels
         """
 
-        #  copy data from hardware channels
-        # for ifc in range(self.NFormulae):
-        for ifc in range(self.NHWChannels):
-            exec("c" + str(ifc) + " = self.data[" + str(ifc) + "]")
-
-        #  apply formulae to signal data
-        for ifc in range(self.NFormulae):
-            if self.Formulae[ifc] is not None:
-                self.data[ifc] = eval(self.Formulae[ifc])
+        self.FormulaEngine(self.block)
 
     def run(self):
         """
@@ -445,26 +707,27 @@ class runPhyPiDAQ(object):
         if self.verbose:
             print("*==* script " + sys.argv[0] + ": data taking active \n")
 
-        longInterval = 5.0  # definiton of a "long" readout interval
-
         interval = self.PhyPiConfDict["Interval"]
         NChannels = self.PhyPiConfDict["NChannels"]
         DisplayModule = self.PhyPiConfDict["DisplayModule"]
+        NBlock = self.BlockSize
+        cycle = interval * NBlock  # duration of read-out cycle
+        # cycle for output of data, slower than read-out in HighRate mode
+        outcycle = max(cycle, 0.05) if self.HighRate else cycle
 
         cmdQ = mp.Queue(1)  # Queue for command input
-        datQ = mp.Queue(1)  # Queue to spy on data transfer inside class Display
         if "startActive" not in self.PhyPiConfDict:
             self.PhyPiConfDict["startActive"] = False  # start in paused-mode
         if "DAQCntrl" not in self.PhyPiConfDict:
             self.PhyPiConfDict["DAQCntrl"] = True  # enable run control buttons
 
+        self.display_manager = None
         if DisplayModule is not None:
             from .DisplayManager import DisplayManager
 
-            display_manager = DisplayManager(
-                interval=None, config_dict=self.PhyPiConfDict, cmd_queue=cmdQ, data_queue=datQ
-            )
-            display_manager.init()
+            self.display_manager = DisplayManager(interval=None, config_dict=self.PhyPiConfDict, cmd_queue=cmdQ)
+            self.display_manager.init()
+        self.initOutput()
 
         self.ACTIVE = True  # background process(es) active
 
@@ -480,10 +743,30 @@ class runPhyPiDAQ(object):
         kbdthrd.daemon = True
         kbdthrd.start()
 
-        # set up space for data
-        self.data = np.zeros(max(NChannels, self.NHWChannels))
+        self.initBuffers()
+
+        # in HighRate mode, devices are read in a background thread
+        #   and data are passed via a ring buffer (of about 10 s of data)
+        if self.HighRate:
+            from .DataRing import DataRing
+            from .HighRateReadout import HighRateReadout
+
+            NRing = max(int(10.0 / interval), 10 * NBlock)
+            NRing = min(NRing, max(2**23 // max(NChannels, 1), 10 * NBlock))  # limit memory to 64 MB
+            ring = DataRing(NRing, NChannels)
+            readout = HighRateReadout(self.acquire, ring, cycle, self.PhyPiConfDict["TimerSpin"], self.stats)
+            readout.start()
+            seq = 0  # sequence number of next sample to read from ring
+            Nlost = 0  # samples overwritten before output
+            if self.verbose:
+                print("  HighRate mode: read-out every {0:.3g} ms".format(1000.0 * cycle))
 
-        tflash = min(0.2, interval / 2.0)  # pulse duration for readout LED
+        # devices with own read-out interval are polled while data taking is active
+        scheduled = self.Readout if hasattr(self.Readout, "resume") else None
+        if scheduled is not None:
+            scheduled.start()
+
+        tflash = min(0.2, outcycle / 2.0)  # pulse duration for readout LED
         if self.RunLED:
             self.RunLED.pulse(0)  # switch on status LED
 
@@ -493,73 +776,51 @@ class runPhyPiDAQ(object):
             # T0 = time.time()
             # brk = False
 
-            wait = DAQwait(interval)  # initialize wait timer
+            # initialize wait timer, precise timing only needed for read-out
+            wait = DAQwait(outcycle, 0.0 if self.HighRate else self.PhyPiConfDict["TimerSpin"])
+            # periodic summary of stage timing
+            StatsInterval = self.PhyPiConfDict["StatsInterval"]
+            tstats = time.time()
 
             while self.ACTIVE:
-                # regularly check for command input for long intervals
-                if interval > longInterval and self.DAQ_ACTIVE:
-                    cmd = 0
-                    while not datQ.empty():  # check for command input
-                        if not cmdQ.empty():
-                            cmd = self.decodeCommand(cmdQ)
-                            if cmd:
-                                break  # got valid command
-                        time.sleep(longInterval / 300.0)
-                    if cmd >= 2:
-                        break  # end command received
-
                 if self.DAQ_ACTIVE:
-                    cnt += 1
-                    # read data
-                    for i, DEV in enumerate(self.DEVs):
-                        DEV.acquireData(self.data[self.ChanIdx_ofDevice[i] :])
+                    if scheduled is not None:
+                        scheduled.resume()
+                    if self.HighRate:
+                        readout.resume()
+                        # output all samples read since last cycle
+                        error = readout.error  # device error ending read-out thread
+                        seq, block, ts, lost = ring.read(seq)
+                        Nlost += lost
+                        if len(block):
+                            self.outputData(block, seq - len(block) + 1, ts, copy=False)  # copies from ring
+                        if error is not None:
+                            raise error
+                    else:
+                        cnt += 1
+                        # read data
+                        block, ts = self.acquire()
+                        self.outputData(block, (cnt - 1) * NBlock + 1, ts)
 
                     if self.ReadoutLED:
                         self.ReadoutLED.pulse(tflash)  # pulse readout LED
 
-                    # eventually calibrate raw readings
-                    if self.CalibFuncts:
-                        self.apply_calibs()
-
-                    # eventually apply formula(e)
-                    if self.Formulae:
-                        self.apply_formulae()
-
-                    # display data
-                    if DisplayModule is not None:
-                        display_manager.showData(self.data[:NChannels])
-
-                    # cumulative sum of date (for hisograms or spectra) ...
-                    if self.sumData is not None:
-                        self.sumData += self.data
-                    # ... else store (latest) data in ring buffer as a list ...
-                    elif self.RBuf is not None:
-                        self.RBuf.store(self.data[:NChannels].tolist())
-                    # ... and record all data to disc ...
-                    if self.DatRec:
-                        self.DatRec(self.data[:NChannels])
-
-                    if self.DAQfifo is not None or self.DAQwebsocket is not None:
-                        # transform data to csv format
-                        csv_data = (
-                            ",".join(
-                                ["{0:.3f}".format(cnt * interval)]
-                                + ["{0:.4g}".format(d) for d in self.data[:NChannels]]
-                            )
-                            + "\n"
-                        )
-                        # ... write to fifo ...
-                        if self.DAQfifo is not None:
-                            self.send_to_fifo(csv_data)
-                        # ... or send to websocket
-                        if self.DAQwebsocket is not None:
-                            self.send_to_websocket(csv_data)
-
-                    # system time-corrected wait
+                    # wait for next deadline
                     wait()
+                    if not self.HighRate:  # slack of read-out thread recorded by HighRateReadout
+                        self.stats.slack(wait.slack)
+
+                    if StatsInterval and time.time() - tstats >= StatsInterval:
+                        tstats = time.time()
+                        self.reportStats()
 
                 else:  # paused mode
-                    time.sleep(min(interval / 10.0, 0.2))
+                    if scheduled is not None:
+                        scheduled.pause()
+                    if self.HighRate:
+                        readout.pause()
+                    time.sleep(min(outcycle / 10.0, 0.2))
+                    wait.reset()
 
                 # check for control input (from keyboard or display module)
                 if not cmdQ.empty():
@@ -580,21 +841,48 @@ class runPhyPiDAQ(object):
         finally:
             self.ACTIVE = False
             print("\n*==* PhyPiDAQ Terminating ...")
+            if self.verbose and not self.HighRate and wait.missed:
+                print("  {0} read-out deadline(s) missed".format(wait.missed))
+            if self.HighRate:
+                readout.stop()
+                if self.verbose:
+                    print(
+                        "  HighRate read-out: {0} cycles, {1} late, {2} samples lost".format(
+                            readout.Ncycles, readout.Nlag, Nlost
+                        )
+                    )
+            if self.bus is not None:
+                # deliver pending data to all outputs, do not wait for blocking ones
+                for s in self.bus.close(timeout=5.0):
+                    print("!!! output {0} still busy - {1} blocks not delivered".format(s.name, len(s.pending)))
+                for s in self.bus.subscribers:
+                    if self.verbose and s.Nlost:
+                        print("  {0}: {1} samples skipped".format(s.name, s.Nlost))
+            if self.StatsFile is not None:
+                self.stats.write(self.StatsFile)
+            if self.verbose > 1:
+                print(self.stats.table())
             if self.RunLED is not None:
                 self.RunLED.pulse(-1)  # RunLED off
+            for name, sink in self.Sinks:
+                if hasattr(sink, "close"):
+                    sink.close()
             if self.DatRec:
                 self.DatRec.close()
+            if self.saveThread is not None:
+                self.saveThread.join()  # complete storing of buffer data
             if self.DAQfifo:
-                self.send_to_fifo("")  # empty record to inform clients
-                self.send_to_fifo.close()
+                self.send_to_fifo.close()  # end of file informs clients
+                if self.verbose and self.send_to_fifo.Ndropped:
+                    print("  fifo: {0} samples dropped".format(self.send_to_fifo.Ndropped))
             if self.DAQwebsocket:
-                self.send_to_websocket("\n")  # empty record to inform clients
-                time.sleep(0.1)
-                self.send_to_websocket.close()
+                self.send_to_websocket.close()  # sends empty record to inform clients
+            if self.Readout is not None:
+                self.Readout.close()
             for DEV in self.DEVs:
                 DEV.closeDevice()  # close down hardware device
-            if DisplayModule is not None:
-                display_manager.close()
+            if self.display_manager is not None:
+                self.display_manager.close()
             if self.RunLED is not None:
                 self.RunLED.close()
             if self.ReadoutLED is not None:
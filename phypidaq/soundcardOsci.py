@@ -49,6 +49,11 @@ class SoundCardOsci:
         self.sample_format = pyaudio.paInt16  # 16 bits per sample
         self.maxADC = 2**15  # for 16 bit soundcard
 
+        # channel properties for use as a PhyPiDAQ device
+        self.ChanNams = ["ch" + str(c) for c in self.channels]
+        self.ChanLims = [[-self.maxADC, self.maxADC]] * self.NChannels
+        self.ChanUnits = ["counts"] * self.NChannels
+
         # create  interface to PortAudio
         self.pyaudio = pyaudio.PyAudio()
 
@@ -150,6 +155,36 @@ class SoundCardOsci:
                 [__d] if self.NChannels == 1 else [__d[0::2], __d[1::2]]
             )
 
+    def acquireData(self, buf):
+        """read next audio frame (untriggered) as one sample"""
+        self.acquireBlock(buf[np.newaxis], 1)
+
+    def acquireBlock(self, buf, n):
+        """read the latest n audio frames (untriggered) as a block of samples
+
+        Frames recorded since the previous read-out are only contiguous with
+        the block if Interval equals the block duration n / sampling_rate;
+        otherwise older frames are discarded, and the input buffer may
+        overflow between read-outs without ending the run.
+
+        Args:
+          buf: array of shape (>=n, >=NChannels), one sample per row
+          n:   number of samples
+
+        Returns: array of n time stamps, the last one at the time of reading
+        """
+        # skip frames recorded before the latest n
+        navail = self.stream.get_read_available()
+        if navail > n:
+            self.stream.read(navail - n, exception_on_overflow=False)
+        __d = np.frombuffer(self.stream.read(n, exception_on_overflow=False), dtype=np.int16)
+        t = time.time()
+        buf[:n, : self.NChannels] = __d.reshape(n, self.NChannels)
+        return t - (n - 1 - np.arange(n)) / self.sampling_rate
+
+    def closeDevice(self):
+        self.close()
+
     def close(self):
         self.active = False
         time.sleep(1.0)